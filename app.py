@@ -18,6 +18,7 @@ from utils.historical_analyzer import HistoricalAnalyzer
 from utils.user_manager import UserManager, display_user_authentication, display_session_management
 from utils.database_manager import DatabaseManager
 from utils.export_manager import ExportManager, display_export_interface
+from utils.grading import grade_array
 from utils.admin_dashboard import display_admin_interface
 
 def main():
@@ -903,7 +904,7 @@ def display_results():
     visualizer = ExamVisualizer()
     
     # Distribution histogram
-    fig_hist = visualizer.create_histogram(marks, pass_mark)
+    fig_hist = visualizer.create_histogram(marks, pass_mark, mean=results['mean'])
     st.plotly_chart(fig_hist, use_container_width=True)
     
     # Box plot
@@ -1022,7 +1023,7 @@ def display_results():
             export_df = pd.DataFrame({
                 'Student_ID': range(1, len(marks) + 1),
                 'Marks': marks,
-                'Grade': [visualizer.get_letter_grade(mark, max_marks) for mark in marks],
+                'Grade': grade_array(marks, max_marks),
                 'Status': ['Pass' if mark >= pass_mark else 'Fail' for mark in marks]
             })
         
@@ -1095,11 +1096,19 @@ def handle_email_sharing(results, marks, pass_threshold, max_marks, grades):
     rankings = getattr(st.session_state, 'rankings', [])
     custom_message = st.text_area("Add Personal Message (optional):", placeholder="Additional notes or comments...")
     
+    # One timestamp and one pass/fail count for the run, shared by the plain-text and HTML parts
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    pass_stats = ExamAnalyzer().calculate_pass_fail_stats(marks, pass_threshold, max_marks)
+    
+    # Built once: shown in plain-text mode and sent as the HTML email's plain-text fallback part
+    email_content = generate_email_content(results, marks, pass_threshold, max_marks, grades, student_info, custom_message, rankings,
+                                           generated_at=generated_at, pass_stats=pass_stats)
+    
     if email_format == "Plain Text":
-        email_content = generate_email_content(results, marks, pass_threshold, max_marks, grades, student_info, custom_message, rankings)
         st.text_area("Email Content:", value=email_content, height=300, disabled=True)
     else:
-        html_content = email_handler.generate_html_content(results, marks, pass_threshold, max_marks, grades, student_info, custom_message)
+        html_content = email_handler.generate_html_content(results, marks, pass_threshold, max_marks, grades, student_info, custom_message,
+                                                           generated_at=generated_at, pass_stats=pass_stats)
         st.markdown("**HTML Preview:**")
         st.components.v1.html(html_content, height=400, scrolling=True)
     
@@ -1110,17 +1119,13 @@ def handle_email_sharing(results, marks, pass_threshold, max_marks, grades):
             if recipient_email and sender_email:
                 if email_handler.is_configured():
                     with st.spinner("Sending email..."):
-                        if email_format == "HTML":
-                            content = html_content
-                        else:
-                            content = email_content
-                        
                         success, message = email_handler.send_analysis_email(
                             to_email=recipient_email,
                             from_email=sender_email,
                             subject=email_subject,
-                            content=content,
-                            cc_emails=cc_emails if cc_emails else None
+                            content=email_content,
+                            cc_emails=cc_emails if cc_emails else None,
+                            html_content=html_content if email_format == "HTML" else None
                         )
                         
                         if success:
@@ -1148,7 +1153,8 @@ def handle_email_sharing(results, marks, pass_threshold, max_marks, grades):
                 mime="text/html" if email_format == "HTML" else "text/plain"
             )
 
-def generate_email_content(results, marks, pass_threshold, max_marks, grades, student_info, custom_message="", rankings=[]):
+def generate_email_content(results, marks, pass_threshold, max_marks, grades, student_info, custom_message="", rankings=[],
+                           generated_at=None, pass_stats=None):
     """Generate formatted email content"""
     content = []
     
@@ -1187,10 +1193,12 @@ def generate_email_content(results, marks, pass_threshold, max_marks, grades, st
     content.append("")
     
     # Pass/Fail analysis
-    pass_mark = (pass_threshold / 100) * max_marks
-    passed = sum(1 for mark in marks if mark >= pass_mark)
-    failed = len(marks) - passed
-    pass_rate = (passed / len(marks)) * 100
+    if pass_stats is None:
+        pass_stats = ExamAnalyzer().calculate_pass_fail_stats(marks, pass_threshold, max_marks)
+    pass_mark = pass_stats['pass_mark']
+    passed = pass_stats['passed_count']
+    failed = pass_stats['failed_count']
+    pass_rate = pass_stats['pass_rate']
     
     content.append("✅ Pass/Fail Analysis:")
     content.append(f"• Pass Threshold: {pass_threshold}% ({pass_mark:.1f} marks)")
@@ -1228,7 +1236,7 @@ def generate_email_content(results, marks, pass_threshold, max_marks, grades, st
         content.append("")
     
     content.append("📋 This analysis was generated using the Exam Analysis Tool.")
-    content.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    content.append(f"Generated on: {generated_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     return "\n".join(content)
 
@@ -1,16 +1,25 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from utils.database_manager import DatabaseManager
+from utils.database_manager import get_database_manager
 from utils.user_manager import UserManager
 import plotly.express as px
 import plotly.graph_objects as go
+from sqlalchemy import func
+
+# Number of users listed per page in user management
+USER_PAGE_SIZE = 200
+# Number of exam sessions listed per page in session management
+SESSION_PAGE_SIZE = 200
+
+# Above this many daily points the usage trends are rolled up to weekly buckets
+TREND_MAX_POINTS = 1000
 
 class AdminDashboard:
     """Administrative dashboard for system management"""
     
     def __init__(self):
-        self.db_manager = DatabaseManager()
+        self.db_manager = get_database_manager()
         self.user_manager = UserManager()
     
     def display_dashboard(self):
@@ -68,114 +77,137 @@ class AdminDashboard:
         
         try:
             # Get recent activity data
-            session = self.db_manager.get_session()
-            
-            # Users created over time
-            from utils.database_manager import User, ExamSession
-            users_df = pd.read_sql(
-                session.query(User.created_at).statement,
-                session.bind
-            )
-            
-            if not users_df.empty:
-                users_df['created_at'] = pd.to_datetime(users_df['created_at'])
-                users_df['date'] = users_df['created_at'].dt.date
-                daily_users = users_df.groupby('date').size().reset_index(name='new_users')
+            with self.db_manager.session_scope() as session:
+                # Users created over time
+                from utils.database_manager import User, ExamSession
+                users_df = pd.read_sql(
+                    session.query(User.created_at).statement,
+                    session.bind
+                )
                 
-                fig_users = px.line(daily_users, x='date', y='new_users', 
-                                  title='New Users Per Day')
-                st.plotly_chart(fig_users, use_container_width=True)
-            
-            # Exam sessions over time
-            sessions_df = pd.read_sql(
-                session.query(ExamSession.created_at, ExamSession.data_mode).statement,
-                session.bind
-            )
-            
-            if not sessions_df.empty:
-                sessions_df['created_at'] = pd.to_datetime(sessions_df['created_at'])
-                sessions_df['date'] = sessions_df['created_at'].dt.date
-                daily_sessions = sessions_df.groupby(['date', 'data_mode']).size().reset_index(name='sessions')
+                if not users_df.empty:
+                    users_df['created_at'] = pd.to_datetime(users_df['created_at'])
+                    freq, label = self._trend_frequency(users_df['created_at'])
+                    users_df['date'] = users_df['created_at'].dt.to_period(freq).dt.start_time
+                    daily_users = users_df.groupby('date').size().reset_index(name='new_users')
+                    
+                    # WebGL trace keeps long date ranges responsive
+                    fig_users = go.Figure(go.Scattergl(
+                        x=daily_users['date'],
+                        y=daily_users['new_users'],
+                        mode='lines+markers',
+                        name='New Users'
+                    ))
+                    fig_users.update_layout(title=f'New Users Per {label}',
+                                            xaxis_title='date', yaxis_title='new_users')
+                    st.plotly_chart(fig_users, use_container_width=True)
                 
-                fig_sessions = px.bar(daily_sessions, x='date', y='sessions', 
-                                    color='data_mode', title='Exam Sessions Per Day')
-                st.plotly_chart(fig_sessions, use_container_width=True)
-            
-            session.close()
+                # Exam sessions over time
+                sessions_df = pd.read_sql(
+                    session.query(ExamSession.created_at, ExamSession.data_mode).statement,
+                    session.bind
+                )
+                
+                if not sessions_df.empty:
+                    sessions_df['created_at'] = pd.to_datetime(sessions_df['created_at'])
+                    freq, label = self._trend_frequency(sessions_df['created_at'])
+                    sessions_df['date'] = sessions_df['created_at'].dt.to_period(freq).dt.start_time
+                    daily_sessions = sessions_df.groupby(['date', 'data_mode']).size().reset_index(name='sessions')
+                    
+                    fig_sessions = px.bar(daily_sessions, x='date', y='sessions', 
+                                        color='data_mode', title=f'Exam Sessions Per {label}')
+                    st.plotly_chart(fig_sessions, use_container_width=True)
             
         except Exception as e:
             st.warning(f"Could not load trend data: {str(e)}")
     
+    def _trend_frequency(self, timestamps):
+        """Pick the bucket size for a usage trend so the chart stays small"""
+        span_days = (timestamps.max() - timestamps.min()).days + 1
+        if span_days > TREND_MAX_POINTS:
+            return 'W', 'Week'
+        return 'D', 'Day'
+    
     def _display_user_management(self):
         """Display user management interface"""
         st.subheader("👥 User Management")
         
         try:
             # Get all users
-            session = self.db_manager.get_session()
-            from utils.database_manager import User
-            
-            users_query = session.query(User).all()
-            
-            if users_query:
-                users_data = []
-                for user in users_query:
-                    users_data.append({
-                        'ID': str(user.id),
-                        'Username': user.username,
-                        'Full Name': user.full_name,
-                        'Email': user.email,
-                        'Institution': user.institution or 'N/A',
-                        'Role': user.role,
-                        'Created': user.created_at.strftime('%Y-%m-%d'),
-                        'Last Active': user.last_active.strftime('%Y-%m-%d %H:%M') if user.last_active else 'Never',
-                        'Status': 'Active' if user.is_active else 'Inactive'
-                    })
-                
-                users_df = pd.DataFrame(users_data)
-                st.dataframe(users_df, use_container_width=True)
-                
-                # User actions
-                st.subheader("User Actions")
+            with self.db_manager.session_scope() as session:
+                from utils.database_manager import User
                 
-                col1, col2 = st.columns(2)
+                # Cheap count first so an empty table never loads rows
+                user_count = session.query(func.count(User.id)).scalar()
                 
-                with col1:
-                    # Deactivate user
-                    user_to_deactivate = st.selectbox(
-                        "Deactivate User:",
-                        options=['Select user...'] + [f"{u.username} ({u.full_name})" for u in users_query if u.is_active]
-                    )
+                if user_count:
+                    user_limit = getattr(st.session_state, 'admin_user_limit', USER_PAGE_SIZE)
+                    users_query = session.query(User).order_by(
+                        User.created_at.desc()
+                    ).limit(user_limit).all()
                     
-                    if st.button("Deactivate User") and user_to_deactivate != 'Select user...':
-                        username = user_to_deactivate.split(' (')[0]
-                        user = session.query(User).filter(User.username == username).first()
-                        if user:
-                            user.is_active = False
-                            session.commit()
-                            st.success(f"User {username} deactivated")
-                            st.rerun()
-                
-                with col2:
-                    # Promote to admin
-                    user_to_promote = st.selectbox(
-                        "Promote to Admin:",
-                        options=['Select user...'] + [f"{u.username} ({u.full_name})" for u in users_query if u.role != 'admin']
-                    )
+                    users_data = []
+                    for user in users_query:
+                        users_data.append({
+                            'ID': str(user.id),
+                            'Username': user.username,
+                            'Full Name': user.full_name,
+                            'Email': user.email,
+                            'Institution': user.institution or 'N/A',
+                            'Role': user.role,
+                            'Created': user.created_at.strftime('%Y-%m-%d'),
+                            'Last Active': user.last_active.strftime('%Y-%m-%d %H:%M') if user.last_active else 'Never',
+                            'Status': 'Active' if user.is_active else 'Inactive'
+                        })
                     
-                    if st.button("Promote to Admin") and user_to_promote != 'Select user...':
-                        username = user_to_promote.split(' (')[0]
-                        user = session.query(User).filter(User.username == username).first()
-                        if user:
-                            user.role = 'admin'
-                            session.commit()
-                            st.success(f"User {username} promoted to admin")
+                    users_df = pd.DataFrame(users_data)
+                    st.dataframe(users_df, use_container_width=True)
+                    
+                    if user_count > len(users_query):
+                        st.caption(f"Showing {len(users_query)} of {user_count} users")
+                        if st.button("Show more users"):
+                            st.session_state.admin_user_limit = user_limit + USER_PAGE_SIZE
                             st.rerun()
-            
-            else:
-                st.info("No users found in the system")
-            
-            session.close()
+                    
+                    # User actions
+                    st.subheader("User Actions")
+                    
+                    col1, col2 = st.columns(2)
+                    
+                    with col1:
+                        # Deactivate user
+                        user_to_deactivate = st.selectbox(
+                            "Deactivate User:",
+                            options=['Select user...'] + [f"{u.username} ({u.full_name})" for u in users_query if u.is_active]
+                        )
+                        
+                        if st.button("Deactivate User") and user_to_deactivate != 'Select user...':
+                            username = user_to_deactivate.split(' (')[0]
+                            user = session.query(User).filter(User.username == username).first()
+                            if user:
+                                user.is_active = False
+                                session.commit()
+                                st.success(f"User {username} deactivated")
+                                st.rerun()
+                    
+                    with col2:
+                        # Promote to admin
+                        user_to_promote = st.selectbox(
+                            "Promote to Admin:",
+                            options=['Select user...'] + [f"{u.username} ({u.full_name})" for u in users_query if u.role != 'admin']
+                        )
+                        
+                        if st.button("Promote to Admin") and user_to_promote != 'Select user...':
+                            username = user_to_promote.split(' (')[0]
+                            user = session.query(User).filter(User.username == username).first()
+                            if user:
+                                user.role = 'admin'
+                                session.commit()
+                                st.success(f"User {username} promoted to admin")
+                                st.rerun()
+                
+                else:
+                    st.info("No users found in the system")
             
         except Exception as e:
             st.error(f"Error loading users: {str(e)}")
@@ -185,54 +217,73 @@ class AdminDashboard:
         st.subheader("📁 Session Management")
         
         try:
-            session = self.db_manager.get_session()
-            from utils.database_manager import ExamSession, User
-            
-            # Get all exam sessions with user info
-            sessions_query = session.query(ExamSession, User).join(
-                User, ExamSession.user_id == User.id
-            ).order_by(ExamSession.created_at.desc()).all()
-            
-            if sessions_query:
-                sessions_data = []
-                for exam_session, user in sessions_query:
-                    sessions_data.append({
-                        'Session ID': str(exam_session.id)[:8] + '...',
-                        'Session Name': exam_session.session_name,
-                        'Exam Name': exam_session.exam_name,
-                        'Class': exam_session.class_name or 'N/A',
-                        'User': user.full_name,
-                        'Data Mode': exam_session.data_mode,
-                        'Created': exam_session.created_at.strftime('%Y-%m-%d %H:%M'),
-                        'Updated': exam_session.updated_at.strftime('%Y-%m-%d %H:%M'),
-                        'Status': 'Active' if exam_session.is_active else 'Inactive'
-                    })
-                
-                sessions_df = pd.DataFrame(sessions_data)
-                st.dataframe(sessions_df, use_container_width=True)
+            with self.db_manager.session_scope() as session:
+                from utils.database_manager import ExamSession, User
                 
-                # Session statistics
-                st.subheader("Session Statistics")
+                # Counts and statistics over every listed session in one aggregate, so they don't depend on the page
+                cutoff = datetime.utcnow() - timedelta(days=7)
+                session_count, active_sessions, multi_sheet_sessions, recent_sessions = session.query(
+                    func.count(ExamSession.id),
+                    func.count(ExamSession.id).filter(ExamSession.is_active == True),
+                    func.count(ExamSession.id).filter(ExamSession.data_mode == 'multi_sheet'),
+                    func.count(ExamSession.id).filter(ExamSession.updated_at > cutoff)
+                ).join(User, ExamSession.user_id == User.id).one()
                 
-                col1, col2, col3 = st.columns(3)
+                # Newest sessions with user info, one page at a time; skipped entirely when there are none
+                session_limit = getattr(st.session_state, 'admin_session_limit', SESSION_PAGE_SIZE)
+                sessions_query = session.query(ExamSession, User).join(
+                    User, ExamSession.user_id == User.id
+                ).order_by(ExamSession.created_at.desc()).limit(session_limit).all() if session_count else []
                 
-                with col1:
-                    active_sessions = sum(1 for s, u in sessions_query if s.is_active)
-                    st.metric("Active Sessions", active_sessions)
-                
-                with col2:
-                    multi_sheet_sessions = sum(1 for s, u in sessions_query if s.data_mode == 'multi_sheet')
-                    st.metric("Multi-Sheet Sessions", multi_sheet_sessions)
+                if sessions_query:
+                    # Collect raw values only; formatting is done column-wise below
+                    raw_df = pd.DataFrame(
+                        [(exam_session.id, exam_session.session_name, exam_session.exam_name,
+                          exam_session.class_name, user.full_name, exam_session.data_mode,
+                          exam_session.created_at, exam_session.updated_at, exam_session.is_active)
+                         for exam_session, user in sessions_query],
+                        columns=['id', 'session_name', 'exam_name', 'class_name', 'full_name',
+                                 'data_mode', 'created_at', 'updated_at', 'is_active']
+                    )
+                    created = pd.to_datetime(raw_df['created_at'])
+                    updated = pd.to_datetime(raw_df['updated_at'])
+                    is_active = raw_df['is_active'].astype(bool)
+                    
+                    sessions_df = pd.DataFrame({
+                        'Session ID': raw_df['id'].astype(str).str.slice(0, 8) + '...',
+                        'Session Name': raw_df['session_name'],
+                        'Exam Name': raw_df['exam_name'],
+                        'Class': raw_df['class_name'].fillna('N/A').replace('', 'N/A'),
+                        'User': raw_df['full_name'],
+                        'Data Mode': raw_df['data_mode'],
+                        'Created': created.dt.strftime('%Y-%m-%d %H:%M'),
+                        'Updated': updated.dt.strftime('%Y-%m-%d %H:%M'),
+                        'Status': is_active.map({True: 'Active', False: 'Inactive'})
+                    })
+                    st.dataframe(sessions_df, use_container_width=True)
+                    
+                    if session_count > len(sessions_query):
+                        st.caption(f"Showing {len(sessions_query)} of {session_count} sessions")
+                        if st.button("Show more sessions"):
+                            st.session_state.admin_session_limit = session_limit + SESSION_PAGE_SIZE
+                            st.rerun()
+                    
+                    # Session statistics
+                    st.subheader("Session Statistics")
+                    
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        st.metric("Active Sessions", active_sessions)
+                    
+                    with col2:
+                        st.metric("Multi-Sheet Sessions", multi_sheet_sessions)
+                    
+                    with col3:
+                        st.metric("Recent Activity (7 days)", recent_sessions)
                 
-                with col3:
-                    recent_sessions = sum(1 for s, u in sessions_query 
-                                        if s.updated_at > datetime.utcnow() - timedelta(days=7))
-                    st.metric("Recent Activity (7 days)", recent_sessions)
-            
-            else:
-                st.info("No exam sessions found")
-            
-            session.close()
+                else:
+                    st.info("No exam sessions found")
             
         except Exception as e:
             st.error(f"Error loading sessions: {str(e)}")
@@ -275,22 +326,20 @@ class AdminDashboard:
         if st.button("📄 Export System Data"):
             try:
                 # Get all users and export their data
-                session = self.db_manager.get_session()
-                from utils.database_manager import User
-                
-                users = session.query(User).all()
-                export_data = {
-                    'export_timestamp': datetime.now().isoformat(),
-                    'system_stats': stats,
-                    'users': []
-                }
-                
-                for user in users:
-                    user_data = self.db_manager.export_user_data(user.id)
-                    if user_data:
-                        export_data['users'].append(user_data)
-                
-                session.close()
+                with self.db_manager.session_scope() as session:
+                    from utils.database_manager import User
+                    
+                    users = session.query(User).all()
+                    export_data = {
+                        'export_timestamp': datetime.now().isoformat(),
+                        'system_stats': stats,
+                        'users': []
+                    }
+                    
+                    for user in users:
+                        user_data = self.db_manager.export_user_data(user.id)
+                        if user_data:
+                            export_data['users'].append(user_data)
                 
                 # Create download
                 import json
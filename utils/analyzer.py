@@ -1,6 +1,9 @@
 import numpy as np
 import pandas as pd
-from scipy import stats
+
+from utils.grading import grade_counts
+
+PERCENTILE_LEVELS = [10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 99]
 
 class ExamAnalyzer:
     """Performs statistical analysis on exam marks."""
@@ -26,53 +29,71 @@ class ExamAnalyzer:
         if len(marks_clean) == 0:
             raise ValueError("No valid marks found")
         
+        # Sort once; quantiles, mode and extremes are all read off the sorted array
+        sorted_marks = np.sort(marks_clean)
+        n = len(sorted_marks)
+        quantiles = np.percentile(sorted_marks, [25, 50, 75] + PERCENTILE_LEVELS)
+        q1, median, q3 = quantiles[:3]
+        moments = self._central_moments(sorted_marks)
+        
         results = {
-            'count': len(marks_clean),
-            'mean': np.mean(marks_clean),
-            'median': np.median(marks_clean),
-            'mode': self._calculate_mode(marks_clean),
-            'std_dev': np.std(marks_clean, ddof=1) if len(marks_clean) > 1 else 0,
-            'variance': np.var(marks_clean, ddof=1) if len(marks_clean) > 1 else 0,
-            'min': np.min(marks_clean),
-            'max': np.max(marks_clean),
-            'range': np.max(marks_clean) - np.min(marks_clean),
-            'q1': np.percentile(marks_clean, 25),
-            'q3': np.percentile(marks_clean, 75),
-            'iqr': np.percentile(marks_clean, 75) - np.percentile(marks_clean, 25),
-            'skewness': stats.skew(marks_clean),
-            'kurtosis': stats.kurtosis(marks_clean),
+            'count': n,
+            'mean': moments['mean'],
+            'median': median,
+            'mode': self._calculate_mode(sorted_marks),
+            'std_dev': np.sqrt(moments['sample_var']) if n > 1 else 0,
+            'variance': moments['sample_var'] if n > 1 else 0,
+            'min': sorted_marks[0],
+            'max': sorted_marks[-1],
+            'range': sorted_marks[-1] - sorted_marks[0],
+            'q1': q1,
+            'q3': q3,
+            'iqr': q3 - q1,
+            'skewness': moments['skewness'],
+            'kurtosis': moments['kurtosis'],
             'marks': marks_clean.tolist()
         }
         
         # Additional statistics
-        results.update(self._calculate_percentiles(marks_clean))
-        results.update(self._detect_outliers(marks_clean))
+        results.update({f'p{p}': value for p, value in zip(PERCENTILE_LEVELS, quantiles[3:])})
+        results.update(self._detect_outliers(marks_clean, q1, q3))
         
         return results
     
-    def _calculate_mode(self, marks):
-        """Calculate mode of marks."""
-        try:
-            mode_result = stats.mode(marks, keepdims=False)
-            # Check if mode is meaningful (appears more than once)
-            if hasattr(mode_result, 'count') and mode_result.count > 1:
-                return float(mode_result.mode)
-            else:
-                return None
-        except:
-            return None
+    def _central_moments(self, marks):
+        """Mean, sample variance, skewness and excess kurtosis from one pass of deviations."""
+        n = len(marks)
+        mean = marks.mean()
+        deviations = marks - mean
+        sq = deviations * deviations
+        m2 = sq.mean()
+        m3 = (sq * deviations).mean()
+        m4 = (sq * sq).mean()
+        
+        # Same (biased) estimators as scipy.stats.skew / kurtosis; nan for constant data
+        skewness = m3 / m2 ** 1.5 if m2 > 0 else np.nan
+        kurtosis = m4 / m2 ** 2 - 3.0 if m2 > 0 else np.nan
+        
+        return {
+            'mean': mean,
+            'sample_var': m2 * n / (n - 1) if n > 1 else 0,
+            'skewness': skewness,
+            'kurtosis': kurtosis
+        }
     
-    def _calculate_percentiles(self, marks):
-        """Calculate various percentiles."""
-        percentiles = {}
-        for p in [10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 99]:
-            percentiles[f'p{p}'] = np.percentile(marks, p)
-        return percentiles
+    def _calculate_mode(self, sorted_marks):
+        """Calculate mode of already sorted marks."""
+        values, counts = np.unique(sorted_marks, return_counts=True)
+        best = counts.argmax()
+        # Check if mode is meaningful (appears more than once)
+        if counts[best] > 1:
+            return float(values[best])
+        return None
     
-    def _detect_outliers(self, marks):
+    def _detect_outliers(self, marks, q1=None, q3=None):
         """Detect outliers using IQR method."""
-        q1 = np.percentile(marks, 25)
-        q3 = np.percentile(marks, 75)
+        if q1 is None or q3 is None:
+            q1, q3 = np.percentile(marks, [25, 75])
         iqr = q3 - q1
         
         lower_bound = q1 - 1.5 * iqr
@@ -101,10 +122,12 @@ class ExamAnalyzer:
             dict: Pass/fail statistics
         """
         pass_mark = (pass_threshold / 100) * max_marks
+        marks_array = np.fromiter(marks, dtype=np.float64)
+        total = marks_array.size
         
-        passed = sum(1 for mark in marks if mark >= pass_mark)
-        failed = len(marks) - passed
-        pass_rate = (passed / len(marks)) * 100 if marks else 0
+        passed = int((marks_array >= pass_mark).sum())
+        failed = total - passed
+        pass_rate = (passed / total) * 100 if total else 0
         
         return {
             'pass_mark': pass_mark,
@@ -125,31 +148,12 @@ class ExamAnalyzer:
         Returns:
             dict: Grade distribution
         """
-        grades = {'A+': 0, 'A': 0, 'B+': 0, 'B': 0, 'C+': 0, 'C': 0, 'D': 0, 'F': 0}
-        
-        for mark in marks:
-            percentage = (mark / max_marks) * 100
-            
-            if percentage >= 95:
-                grades['A+'] += 1
-            elif percentage >= 85:
-                grades['A'] += 1
-            elif percentage >= 75:
-                grades['B+'] += 1
-            elif percentage >= 65:
-                grades['B'] += 1
-            elif percentage >= 55:
-                grades['C+'] += 1
-            elif percentage >= 45:
-                grades['C'] += 1
-            elif percentage >= 35:
-                grades['D'] += 1
-            else:
-                grades['F'] += 1
+        marks_array = np.fromiter(marks, dtype=np.float64)
+        grades = grade_counts(marks_array, max_marks)
         
         # Convert to percentages
-        total = len(marks)
-        grade_percentages = {grade: (count / total) * 100 for grade, count in grades.items()}
+        total = marks_array.size
+        grade_percentages = {grade: (count / total) * 100 if total else 0 for grade, count in grades.items()}
         
         return {
             'counts': grades,
@@ -2,9 +2,46 @@ import pandas as pd
 import PyPDF2
 import io
 import re
+import codecs
 import streamlit as st
 from difflib import SequenceMatcher
 import numpy as np
+import pyarrow as pa
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+try:
+    import python_calamine
+    EXCEL_ENGINE = 'calamine'  # Rust reader, much faster than building the openpyxl DOM
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Integers and decimals; cannot match a sign or a bare dot, so float() always succeeds
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+# Bytes read from the start of a CSV to pick its encoding
+CSV_SAMPLE_BYTES = 64 * 1024
+
+# Column headers (case-insensitive) that hold a student's score in multi-sheet uploads
+SCORE_COLUMNS = frozenset({'marks', 'score', 'grade', 'total', 'points'})
+
+# Below this many marks the plain loop beats the NumPy setup cost
+VECTORIZE_MIN_MARKS = 128
+
+# float64 rather than float32 so marks such as 85.1 are not altered on display
+ARROW_FLOAT = pd.ArrowDtype(pa.float64())
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _parse_upload(file_bytes, file_type):
+    """Parse uploaded file bytes, cached on their content."""
+    return DataProcessor()._parse_file(io.BytesIO(file_bytes), file_type)
 
 class DataProcessor:
     """Handles processing of uploaded files and extracting exam marks."""
@@ -22,49 +59,63 @@ class DataProcessor:
         file_type = uploaded_file.type
         
         try:
-            if file_type == "text/csv":
-                return self._process_csv(uploaded_file)
-            elif file_type in ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
-                              "application/vnd.ms-excel"]:
-                return self._process_excel(uploaded_file)
-            elif file_type == "application/pdf":
-                return self._process_pdf(uploaded_file)
-            else:
-                raise ValueError(f"Unsupported file type: {file_type}")
+            # Keyed on the file bytes, so widget reruns reuse the parsed result
+            return _parse_upload(uploaded_file.getvalue(), file_type)
                 
         except Exception as e:
             st.error(f"Error processing file: {str(e)}")
             return None
     
+    def _parse_file(self, file_obj, file_type):
+        """Dispatch a file-like object to the parser for its type."""
+        if file_type == "text/csv":
+            return self._process_csv(file_obj)
+        elif file_type in ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
+                          "application/vnd.ms-excel"]:
+            return self._process_excel(file_obj)
+        elif file_type == "application/pdf":
+            return self._process_pdf(file_obj)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type}")
+    
     def _process_csv(self, uploaded_file):
         """Process CSV file."""
         try:
-            # Try different encodings
-            encodings = ['utf-8', 'latin-1', 'cp1252']
+            # Sniff the encoding from a sample instead of re-parsing the whole file per guess
+            uploaded_file.seek(0)
+            sample = uploaded_file.read(CSV_SAMPLE_BYTES)
+            uploaded_file.seek(0)
+            encoding = 'utf-8' if self._is_utf8(sample) else 'latin-1'
             
-            for encoding in encodings:
-                try:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding=encoding)
-                    return self._clean_dataframe(df)
-                except UnicodeDecodeError:
-                    continue
+            try:
+                df = pd.read_csv(uploaded_file, encoding=encoding, engine='c', dtype_backend='pyarrow')
+            except UnicodeDecodeError:
+                # Invalid UTF-8 past the sample; latin-1 decodes any byte sequence
+                uploaded_file.seek(0)
+                df = pd.read_csv(uploaded_file, encoding='latin-1', engine='c', dtype_backend='pyarrow')
             
-            raise ValueError("Could not decode CSV file with any supported encoding")
+            return self._clean_dataframe(df)
             
         except Exception as e:
             raise Exception(f"Error reading CSV: {str(e)}")
     
+    def _is_utf8(self, sample):
+        """Check whether a byte sample decodes as UTF-8, allowing a character cut off at the end."""
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return True
+        except UnicodeDecodeError:
+            return False
+    
     def _process_excel(self, uploaded_file):
         """Process Excel file with multi-sheet support."""
         try:
-            # Read all sheets
-            excel_file = pd.ExcelFile(uploaded_file)
-            all_sheets = {}
-            
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(uploaded_file, sheet_name=sheet_name, engine='openpyxl')
-                all_sheets[sheet_name] = self._clean_dataframe(df)
+            # Read all sheets from one opened workbook instead of re-reading the file per sheet
+            with pd.ExcelFile(uploaded_file, engine=EXCEL_ENGINE) as excel_file:
+                all_sheets = {
+                    sheet_name: self._clean_dataframe(excel_file.parse(sheet_name, dtype_backend='pyarrow'))
+                    for sheet_name in excel_file.sheet_names
+                }
             
             # If only one sheet, return it directly
             if len(all_sheets) == 1:
@@ -79,12 +130,11 @@ class DataProcessor:
     def _process_pdf(self, uploaded_file):
         """Process PDF file and extract numeric data."""
         try:
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            text = ""
-            
             # Extract text from all pages
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            if PDFIUM_AVAILABLE:
+                text = self._extract_pdf_text_pdfium(uploaded_file)
+            else:
+                text = self._extract_pdf_text_pypdf2(uploaded_file)
             
             if not text.strip():
                 raise Exception("Could not extract text from PDF")
@@ -92,7 +142,7 @@ class DataProcessor:
             # Extract numbers from text
             numbers = self._extract_numbers_from_text(text)
             
-            if not numbers:
+            if numbers.size == 0:
                 raise Exception("No numeric data found in PDF")
             
             # Create DataFrame
@@ -102,24 +152,32 @@ class DataProcessor:
         except Exception as e:
             raise Exception(f"Error reading PDF: {str(e)}")
     
+    def _extract_pdf_text_pdfium(self, uploaded_file):
+        """Extract text with the C-backed PDFium engine."""
+        pdf = pdfium.PdfDocument(uploaded_file.read())
+        pages_text = []
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages_text.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+        return "\n".join(pages_text)
+    
+    def _extract_pdf_text_pypdf2(self, uploaded_file):
+        """Extract text with PyPDF2 when pypdfium2 is not installed."""
+        pdf_reader = PyPDF2.PdfReader(uploaded_file)
+        return "\n".join(page.extract_text() for page in pdf_reader.pages)
+    
     def _extract_numbers_from_text(self, text):
-        """Extract numeric values from text."""
-        # Find all numbers (including decimals)
-        number_pattern = r'\b\d+(?:\.\d+)?\b'
-        numbers = re.findall(number_pattern, text)
-        
-        # Convert to float and filter reasonable exam scores (0-100 range typically)
-        numeric_values = []
-        for num in numbers:
-            try:
-                val = float(num)
-                # Filter values that could be exam scores (adjust range as needed)
-                if 0 <= val <= 200:  # Allowing up to 200 for bonus marks
-                    numeric_values.append(val)
-            except ValueError:
-                continue
+        """Extract numeric values from text as a float64 array."""
+        matches = _NUMBER_RE.findall(text)
+        values = np.fromiter((float(m) for m in matches), dtype=np.float64, count=len(matches))
         
-        return numeric_values
+        # Keep values that could be exam scores (0-100 typically, allowing up to 200 for bonus marks)
+        return values[(values >= 0.0) & (values <= 200.0)]
     
     def _clean_dataframe(self, df):
         """Clean and validate DataFrame."""
@@ -129,16 +187,23 @@ class DataProcessor:
         # Remove completely empty rows and columns
         df = df.dropna(how='all').dropna(axis=1, how='all')
         
-        # Convert numeric columns more carefully
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                # Try to convert to numeric
-                numeric_col = pd.to_numeric(df[col], errors='coerce')
-                if not numeric_col.isna().all():
-                    # Ensure proper float conversion to avoid Arrow issues
-                    df[col] = numeric_col.astype('float64')
-        
-        return df
+        # Convert numeric columns more carefully, building the frame once instead of per column
+        return df.apply(self._coerce_numeric_column)
+    
+    def _coerce_numeric_column(self, column):
+        """Convert a text column to Arrow floats if any of its values are numeric."""
+        dtype = column.dtype
+        # Columns the reader already typed as numbers need no coercion pass
+        if pd.api.types.is_numeric_dtype(dtype):
+            return column
+        if dtype == 'object' or pd.api.types.is_string_dtype(dtype):
+            # Go through object because coercing Arrow strings directly yields NaN
+            # rather than missing values
+            numeric_col = pd.to_numeric(column.astype(object), errors='coerce')
+            if not numeric_col.isna().all():
+                # Arrow-backed floats hand straight to Streamlit without a conversion copy
+                return numeric_col.astype(ARROW_FLOAT)
+        return column
     
     def validate_marks_data(self, marks, min_val=0, max_val=100):
         """
@@ -152,6 +217,12 @@ class DataProcessor:
         Returns:
             tuple: (valid_marks, invalid_count)
         """
+        if isinstance(marks, (pd.Series, np.ndarray, list)) and len(marks) > VECTORIZE_MIN_MARKS:
+            return self._validate_marks_vectorized(marks, min_val, max_val)
+        if isinstance(marks, (pd.Series, np.ndarray)):
+            # Truth-testing an array is ambiguous, so short ones go through the loop as a list
+            marks = marks.tolist()
+        
         if not marks:
             return [], 0
         
@@ -170,6 +241,13 @@ class DataProcessor:
         
         return valid_marks, invalid_count
     
+    def _validate_marks_vectorized(self, marks, min_val, max_val):
+        """NumPy version of validate_marks_data for larger inputs."""
+        values = pd.to_numeric(pd.Series(marks), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        # NaN from unparseable entries fails both comparisons, so it counts as invalid
+        valid = (values >= min_val) & (values <= max_val)
+        return values[valid].tolist(), int(valid.size - np.count_nonzero(valid))
+    
     def consolidate_student_data(self, sheets_data, similarity_threshold=0.8):
         """
         Consolidate data from multiple sheets, matching similar student names.
@@ -183,37 +261,46 @@ class DataProcessor:
         """
         consolidated_data = {}
         all_students = {}
+        # Look up each sheet's name and score columns once for both passes
+        sheet_columns = {sheet_name: self._find_sheet_columns(df) for sheet_name, df in sheets_data.items()}
         
         # First pass: collect all unique student names
         for sheet_name, df in sheets_data.items():
-            if 'student_name' in df.columns or 'name' in df.columns:
-                name_col = 'student_name' if 'student_name' in df.columns else 'name'
+            name_col, _ = sheet_columns[sheet_name]
+            if name_col is not None:
                 for name in df[name_col].dropna():
                     name = str(name).strip()
                     if name:
                         all_students[name] = name
         
         # Create consolidated student list with name matching
-        consolidated_names = {}
-        used_names = set()
+        names = list(all_students.keys())
+        matches = self._name_match_matrix(names, similarity_threshold)
         
-        for name in all_students.keys():
-            if name in used_names:
-                continue
-                
-            # Find similar names
-            similar_names = [name]
-            for other_name in all_students.keys():
-                if other_name != name and other_name not in used_names:
-                    similarity = self._calculate_name_similarity(name, other_name)
-                    if similarity >= similarity_threshold:
-                        similar_names.append(other_name)
-            
+        # Union-find over matching pairs so clusters are transitive and independent of name order
+        parent = list(range(len(names)))
+        
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        for i, j in zip(*np.nonzero(np.triu(matches, k=1))):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+        
+        clusters = {}
+        for i, name in enumerate(names):
+            clusters.setdefault(find(i), []).append(name)
+        
+        consolidated_names = {}
+        for similar_names in clusters.values():
             # Use the most common/longest name as canonical
             canonical_name = max(similar_names, key=len)
             for similar_name in similar_names:
                 consolidated_names[similar_name] = canonical_name
-                used_names.add(similar_name)
         
         # Second pass: consolidate data by canonical names
         student_data = {}
@@ -221,38 +308,77 @@ class DataProcessor:
         for sheet_name, df in sheets_data.items():
             subject_name = sheet_name.replace('_', ' ').title()
             
-            if 'student_name' in df.columns or 'name' in df.columns:
-                name_col = 'student_name' if 'student_name' in df.columns else 'name'
-                score_col = None
+            name_col, score_col = sheet_columns[sheet_name]
+            if name_col is not None and score_col is not None:
+                original_names = df[name_col].astype(str).str.strip()
+                canonical_names = original_names.map(consolidated_names).fillna(original_names)
+                scores = df[score_col]
+                mask = scores.notna() & canonical_names.ne('')
                 
-                # Find score column
-                for col in df.columns:
-                    if col.lower() in ['marks', 'score', 'grade', 'total', 'points']:
-                        score_col = col
-                        break
-                
-                if score_col:
-                    for _, row in df.iterrows():
-                        original_name = str(row[name_col]).strip()
-                        canonical_name = consolidated_names.get(original_name, original_name)
-                        score = row[score_col]
-                        
-                        if pd.notna(score) and canonical_name:
-                            if canonical_name not in student_data:
-                                student_data[canonical_name] = {}
-                            student_data[canonical_name][subject_name] = float(score)
+                for canonical_name, score in zip(canonical_names[mask].to_numpy(), scores[mask].to_numpy()):
+                    student_data.setdefault(canonical_name, {})[subject_name] = float(score)
         
-        # Calculate total scores
-        for student, subjects in student_data.items():
-            student_data[student]['Total'] = sum(subjects.values())
+        # Calculate total scores in one reduction over a student x subject frame
+        if student_data:
+            totals = pd.DataFrame.from_dict(student_data, orient='index').sum(axis=1)
+            student_data = {
+                student: {**subjects, 'Total': total}
+                for (student, subjects), total in zip(student_data.items(), totals.tolist())
+            }
         
         return student_data
     
-    def _calculate_name_similarity(self, name1, name2):
-        """Calculate similarity between two names."""
-        name1 = name1.lower().strip()
-        name2 = name2.lower().strip()
+    def _find_sheet_columns(self, df):
+        """Return the (name, score) columns of a sheet, with None for any that is missing."""
+        columns = df.columns
+        name_col = 'student_name' if 'student_name' in columns else ('name' if 'name' in columns else None)
+        score_col = next((col for col in columns if str(col).lower() in SCORE_COLUMNS), None)
+        return name_col, score_col
+    
+    def _name_match_matrix(self, names, similarity_threshold):
+        """Boolean matrix marking name pairs whose similarity reaches the threshold."""
+        # Normalize once per name rather than once per comparison
+        normalized = [name.lower().strip() for name in names]
+        if not RAPIDFUZZ_AVAILABLE:
+            return self._name_match_matrix_python(normalized, similarity_threshold)
+        
+        # Same scores as _calculate_name_similarity, computed for all pairs in native code
+        ratios = process.cdist(normalized, normalized, scorer=fuzz.ratio, dtype=np.float64) / 100.0
+        # partial_ratio is 100 exactly when one name contains the other
+        contained = process.cdist(normalized, normalized, scorer=fuzz.partial_ratio, score_cutoff=100) == 100
+        similarity = np.where(ratios == 1.0, 1.0, np.where(contained, 0.9, ratios))
+        return similarity >= similarity_threshold
+    
+    def _name_match_matrix_python(self, normalized, similarity_threshold):
+        """Pure-Python match matrix that skips pairs whose lengths alone rule out a match."""
+        n = len(normalized)
+        matches = np.zeros((n, n), dtype=bool)
+        by_length = sorted(range(n), key=lambda k: len(normalized[k]))
         
+        for pos, i in enumerate(by_length):
+            name1 = normalized[i]
+            for j in by_length[pos + 1:]:
+                name2 = normalized[j]
+                # name1 is never longer than name2, so only name1 can be the substring
+                if name1 == name2 or name1 in name2:
+                    matched = name1 == name2 or 0.9 >= similarity_threshold
+                elif 2.0 * len(name1) / (len(name1) + len(name2)) < similarity_threshold:
+                    # Upper bound on the ratio; it only shrinks as name2 gets longer
+                    if similarity_threshold > 0.9:
+                        break
+                    continue
+                else:
+                    # SequenceMatcher is not symmetric; keep roster order as before
+                    matcher = SequenceMatcher(None, *((name1, name2) if i < j else (name2, name1)), autojunk=True)
+                    # quick_ratio is a cheap upper bound on ratio, so most non-matches skip the full comparison
+                    matched = (matcher.quick_ratio() >= similarity_threshold
+                               and matcher.ratio() >= similarity_threshold)
+                if matched:
+                    matches[i, j] = matches[j, i] = True
+        return matches
+    
+    def _calculate_name_similarity(self, name1, name2):
+        """Calculate similarity between two names already lowercased and stripped."""
         # Direct match
         if name1 == name2:
             return 1.0
@@ -262,7 +388,9 @@ class DataProcessor:
             return 0.9
         
         # Use sequence matcher for overall similarity
-        return SequenceMatcher(None, name1, name2).ratio()
+        if RAPIDFUZZ_AVAILABLE:
+            return fuzz.ratio(name1, name2) / 100.0
+        return SequenceMatcher(None, name1, name2, autojunk=True).ratio()
     
     def process_multi_sheet_data(self, uploaded_file):
         """
@@ -272,7 +400,7 @@ class DataProcessor:
             tuple: (consolidated_student_data, sheet_names, raw_sheets_data)
         """
         try:
-            sheets_data = self._process_excel(uploaded_file)
+            sheets_data = _parse_upload(uploaded_file.getvalue(), uploaded_file.type)
             
             if isinstance(sheets_data, pd.DataFrame):
                 # Single sheet
@@ -1,14 +1,20 @@
 import os
 import uuid
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Float, Integer, JSON, Boolean
+from sqlalchemy import create_engine, func, insert, inspect, update, Column, String, DateTime, Text, Float, Integer, JSON, Boolean, Index
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
 import streamlit as st
 import pandas as pd
 import json
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
 class User(Base):
@@ -42,6 +48,11 @@ class ExamSession(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    
+    __table_args__ = (
+        # get_user_exam_sessions: filter by user and active flag, newest first
+        Index('ix_exam_sessions_user_active_created', 'user_id', 'is_active', 'created_at'),
+    )
 
 class StudentData(Base):
     """Student data model"""
@@ -55,6 +66,11 @@ class StudentData(Base):
     rank = Column(Integer)
     grade_letter = Column(String(5))
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Conflict target for upserting a session's students; also serves get_student_data lookups
+        Index('ux_student_data_session_student', 'exam_session_id', 'student_name', unique=True),
+    )
 
 class AnalysisResults(Base):
     """Analysis results model"""
@@ -65,6 +81,11 @@ class AnalysisResults(Base):
     analysis_type = Column(String(50))  # statistical, ranking, historical
     results_data = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # get_analysis_results: filter by session (and optionally type), newest first
+        Index('ix_analysis_results_session_type_created', 'exam_session_id', 'analysis_type', 'created_at'),
+    )
 
 class HistoricalComparison(Base):
     """Historical comparison data"""
@@ -77,6 +98,11 @@ class HistoricalComparison(Base):
     comparison_data = Column(JSON)
     insights = Column(JSON)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # get_historical_comparisons: filter by user, newest first
+        Index('ix_historical_comparisons_user_created', 'user_id', 'created_at'),
+    )
 
 class DatabaseManager:
     """Comprehensive database management for exam analysis"""
@@ -86,23 +112,64 @@ class DatabaseManager:
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable not set")
         
-        self.engine = create_engine(self.database_url)
+        # Pre-ping replaces connections dropped while the app sat idle between reruns
+        self.engine = create_engine(
+            self.database_url,
+            pool_size=20,
+            max_overflow=10,
+            pool_pre_ping=True,
+            pool_recycle=1800
+        )
         self.SessionLocal = scoped_session(sessionmaker(bind=self.engine))
         
         # Create tables
         Base.metadata.create_all(self.engine)
+        self._create_missing_indexes()
+        
+        # ON CONFLICT needs the unique index, which duplicate rows in an older table can block
+        self.upsert_student_data = (
+            self.engine.dialect.name == 'postgresql'
+            and any(index['name'] == 'ux_student_data_session_student'
+                    for index in inspect(self.engine).get_indexes('student_data'))
+        )
+    
+    def _create_missing_indexes(self):
+        """Create model indexes on tables that existed before the index was added."""
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(self.engine, checkfirst=True)
+                except SQLAlchemyError as e:
+                    # Another process can create the index between the check and the CREATE; that is fine
+                    if 'already exists' in str(getattr(e, 'orig', e)).lower():
+                        continue
+                    # Anything else (permissions, lock timeout, duplicate rows for a unique index) is worth
+                    # knowing about; the app still runs, and the student upsert falls back without the unique index
+                    logger.exception("Creating index %s on %s failed", index.name, table.name)
     
     def get_session(self):
         """Get database session"""
         return self.SessionLocal()
     
+    @contextmanager
+    def session_scope(self):
+        """Yield a database session that is rolled back on error and always closed"""
+        session = self.get_session()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
     def close_session(self):
         """Close database session"""
         self.SessionLocal.remove()
     
     # User Management
     def create_user(self, username, email, full_name, institution=None, role='teacher'):
-        """Create a new user"""
+        """Create a new user and return it, detached with every column loaded"""
         session = self.get_session()
         try:
             user = User(
@@ -113,8 +180,11 @@ class DatabaseManager:
                 role=role
             )
             session.add(user)
+            # All column defaults are set client-side on flush; detach before commit so they aren't expired
+            session.flush()
+            session.expunge(user)
             session.commit()
-            return user.id
+            return user
         except Exception as e:
             session.rollback()
             raise e
@@ -134,10 +204,11 @@ class DatabaseManager:
         """Update user's last active timestamp"""
         session = self.get_session()
         try:
-            user = session.query(User).filter(User.id == user_id).first()
-            if user:
-                user.last_active = datetime.utcnow()
-                session.commit()
+            # One UPDATE statement instead of loading the row first
+            session.query(User).filter(User.id == user_id).update(
+                {User.last_active: datetime.utcnow()}, synchronize_session=False
+            )
+            session.commit()
         except Exception as e:
             session.rollback()
         finally:
@@ -189,23 +260,66 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def soft_delete_exam_session(self, session_id, user_id):
+        """
+        Mark a user's exam session inactive.
+        
+        Args:
+            session_id: Exam session ID
+            user_id: ID of the user who must own the session
+            
+        Returns:
+            bool: True if the session existed and belonged to the user
+        """
+        with self.session_scope() as session:
+            # Ownership check and write in one UPDATE ... RETURNING, so nothing can change in between
+            deleted_id = session.execute(
+                update(ExamSession)
+                .where(ExamSession.id == session_id, ExamSession.user_id == user_id)
+                .values(is_active=False)
+                .returning(ExamSession.id)
+            ).scalar_one_or_none()
+            session.commit()
+        return deleted_id is not None
+    
     # Student Data Management
     def save_student_data(self, exam_session_id, students_data):
         """Save student data for an exam session"""
         session = self.get_session()
         try:
-            # Clear existing data for this session
-            session.query(StudentData).filter(StudentData.exam_session_id == exam_session_id).delete()
+            # Row dicts go out in one statement rather than one ORM object per student
+            rows = [
+                {
+                    'exam_session_id': exam_session_id,
+                    'student_name': student_name,
+                    'total_score': data.get('Total', 0),
+                    'subject_scores': {k: v for k, v in data.items() if k != 'Total'}
+                }
+                for student_name, data in students_data.items()
+            ]
             
-            # Add new data
-            for student_name, data in students_data.items():
-                student_record = StudentData(
-                    exam_session_id=exam_session_id,
-                    student_name=student_name,
-                    total_score=data.get('Total', 0),
-                    subject_scores={k: v for k, v in data.items() if k != 'Total'}
-                )
-                session.add(student_record)
+            if self.upsert_student_data:
+                # Update students in place and only delete the ones missing from this upload
+                session.query(StudentData).filter(
+                    StudentData.exam_session_id == exam_session_id,
+                    StudentData.student_name.notin_(list(students_data))
+                ).delete(synchronize_session=False)
+                
+                if rows:
+                    stmt = pg_insert(StudentData)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['exam_session_id', 'student_name'],
+                        set_={
+                            'total_score': stmt.excluded.total_score,
+                            'subject_scores': stmt.excluded.subject_scores
+                        }
+                    )
+                    session.execute(stmt, rows)
+            else:
+                # Clear existing data for this session
+                session.query(StudentData).filter(StudentData.exam_session_id == exam_session_id).delete()
+                if rows:
+                    session.execute(insert(StudentData), rows)
             
             session.commit()
             return True
@@ -223,17 +337,35 @@ class DatabaseManager:
                 StudentData.exam_session_id == exam_session_id
             ).all()
             
-            student_data = {}
-            for student in students:
-                student_data[student.student_name] = {
-                    'Total': student.total_score,
-                    **student.subject_scores
-                }
+            return self._student_data_dict(students)
+        finally:
+            session.close()
+    
+    def get_exam_session_with_data(self, session_id):
+        """Get an exam session and its student data in one round trip; (None, {}) if there is no such session"""
+        session = self.get_session()
+        try:
+            # Outer join so a session without saved students still comes back, paired with None
+            rows = session.query(ExamSession, StudentData).outerjoin(
+                StudentData, StudentData.exam_session_id == ExamSession.id
+            ).filter(ExamSession.id == session_id).all()
             
-            return student_data
+            if not rows:
+                return None, {}
+            return rows[0][0], self._student_data_dict(student for _, student in rows if student is not None)
         finally:
             session.close()
     
+    def _student_data_dict(self, students):
+        """student -> {'Total': score, subject: score} from StudentData rows"""
+        return {
+            student.student_name: {
+                'Total': student.total_score,
+                **student.subject_scores
+            }
+            for student in students
+        }
+    
     # Analysis Results Management
     def save_analysis_results(self, exam_session_id, analysis_type, results):
         """Save analysis results"""
@@ -311,6 +443,16 @@ class DatabaseManager:
                 return None
             
             exam_sessions = session.query(ExamSession).filter(ExamSession.user_id == user_id).all()
+            session_ids = [exam_session.id for exam_session in exam_sessions]
+            
+            # Fetch every session's children in one query per table instead of two per session
+            students_by_session = {}
+            results_by_session = {}
+            if session_ids:
+                for student in session.query(StudentData).filter(StudentData.exam_session_id.in_(session_ids)):
+                    students_by_session.setdefault(student.exam_session_id, []).append(student)
+                for result in session.query(AnalysisResults).filter(AnalysisResults.exam_session_id.in_(session_ids)):
+                    results_by_session.setdefault(result.exam_session_id, []).append(result)
             
             export_data = {
                 'user': {
@@ -340,11 +482,7 @@ class DatabaseManager:
                 }
                 
                 # Get student data
-                students = session.query(StudentData).filter(
-                    StudentData.exam_session_id == exam_session.id
-                ).all()
-                
-                for student in students:
+                for student in students_by_session.get(exam_session.id, []):
                     session_data['students'].append({
                         'name': student.student_name,
                         'total_score': student.total_score,
@@ -354,11 +492,7 @@ class DatabaseManager:
                     })
                 
                 # Get analysis results
-                analysis_results = session.query(AnalysisResults).filter(
-                    AnalysisResults.exam_session_id == exam_session.id
-                ).all()
-                
-                for result in analysis_results:
+                for result in results_by_session.get(exam_session.id, []):
                     session_data['analysis_results'].append({
                         'analysis_type': result.analysis_type,
                         'results_data': result.results_data,
@@ -376,14 +510,17 @@ class DatabaseManager:
         """Get database usage statistics"""
         session = self.get_session()
         try:
-            stats = {
-                'total_users': session.query(User).count(),
-                'active_users': session.query(User).filter(User.is_active == True).count(),
-                'total_exam_sessions': session.query(ExamSession).count(),
-                'total_students': session.query(StudentData).count(),
-                'total_analysis_results': session.query(AnalysisResults).count(),
-                'total_historical_comparisons': session.query(HistoricalComparison).count()
+            # All counts as scalar subqueries of one SELECT, so a single round-trip
+            counts = {
+                'total_users': session.query(func.count(User.id)),
+                'active_users': session.query(func.count(User.id)).filter(User.is_active == True),
+                'total_exam_sessions': session.query(func.count(ExamSession.id)),
+                'total_students': session.query(func.count(StudentData.id)),
+                'total_analysis_results': session.query(func.count(AnalysisResults.id)),
+                'total_historical_comparisons': session.query(func.count(HistoricalComparison.id))
             }
+            row = session.query(*(query.scalar_subquery().label(name) for name, query in counts.items())).one()
+            stats = dict(row._mapping)
             return stats
         finally:
             session.close()
@@ -406,4 +543,9 @@ class DatabaseManager:
             session.rollback()
             raise e
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+@lru_cache(maxsize=None)
+def get_database_manager():
+    """Process-wide DatabaseManager; each one builds an engine and checks the schema, so reruns share this one"""
+    return DatabaseManager()
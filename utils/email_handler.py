@@ -1,12 +1,149 @@
 import os
 import sys
+import logging
+import importlib.util
+import numpy as np
 from datetime import datetime
+from functools import lru_cache
+from html import escape
+# Probe for the SDK without importing it; it is only loaded once a send needs it
+SENDGRID_AVAILABLE = importlib.util.find_spec("sendgrid") is not None
 try:
-    from sendgrid import SendGridAPIClient
-    from sendgrid.helpers.mail import Mail, Email, To, Content
-    SENDGRID_AVAILABLE = True
+    import httpx
+    HTTPX_AVAILABLE = True
 except ImportError:
-    SENDGRID_AVAILABLE = False
+    HTTPX_AVAILABLE = False
+
+SENDGRID_API_URL = "https://api.sendgrid.com"
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def _pooled_http_client(api_key):
+    """Process-wide httpx client; EmailHandler is rebuilt on every rerun so it can't own this"""
+    return httpx.Client(
+        base_url=SENDGRID_API_URL,
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=30,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    )
+
+@lru_cache(maxsize=None)
+def _sendgrid_client(api_key):
+    """Process-wide SendGrid SDK client, used when httpx is not installed"""
+    from sendgrid import SendGridAPIClient
+    return SendGridAPIClient(api_key)
+
+def _send_error(e):
+    """Log a failed send with its traceback and return a short (success, message) result"""
+    logger.exception("Sending email failed")
+    return False, f"Error sending email: {type(e).__name__}"
+
+# Fixed markup of the analysis email, kept as plain strings so renders only copy them
+_HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background: linear-gradient(90deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; }
+        .info-box { background: #f8f9fa; padding: 15px; border-left: 4px solid #667eea; margin: 15px 0; }
+        .stats-table { width: 100%; border-collapse: collapse; margin: 15px 0; }
+        .stats-table th, .stats-table td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        .stats-table th { background-color: #f2f2f2; }
+        .grade-item { display: inline-block; margin: 5px; padding: 5px 10px; background: #e3f2fd; border-radius: 5px; }
+        .footer { background: #f8f9fa; padding: 15px; text-align: center; color: #666; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>📊 Exam Analysis Results</h1>
+        """
+_HTML_CONTENT_OPEN = """
+    </div>
+    <div class="content">"""
+_HTML_CLOSE = """
+    </div>
+</body>
+</html>
+"""
+
+def _iter_analysis_html(results, pass_threshold, pass_mark, passed, failed, pass_rate,
+                        grade_items, exam_name, class_info, custom_message, teacher_name, generated_at):
+    """Analysis email template compiled by hand into Python, yielding the page in fragments; text arguments arrive already escaped"""
+    yield _HTML_HEAD
+    
+    if exam_name:
+        yield f"<h2>{exam_name}</h2>"
+    if class_info:
+        yield f"<p>{' | '.join(class_info)}</p>"
+    
+    yield _HTML_CONTENT_OPEN
+    
+    if custom_message:
+        yield f"""
+        <div class="info-box">
+            <h3>Personal Message</h3>
+            <p>{custom_message}</p>
+        </div>"""
+    
+    yield f"""
+        <h2>📊 Key Statistics</h2>
+        <table class="stats-table">
+            <tr><th>Metric</th><th>Value</th></tr>
+            <tr><td>Total Students</td><td>{results['count']}</td></tr>
+            <tr><td>Average Score</td><td>{results['mean']:.2f}</td></tr>
+            <tr><td>Median Score</td><td>{results['median']:.2f}</td></tr>
+            <tr><td>Highest Score</td><td>{results['max']:.2f}</td></tr>
+            <tr><td>Lowest Score</td><td>{results['min']:.2f}</td></tr>
+            <tr><td>Standard Deviation</td><td>{results['std_dev']:.2f}</td></tr>
+        </table>
+
+        <h2>✅ Pass/Fail Analysis</h2>
+        <table class="stats-table">
+            <tr><th>Metric</th><th>Value</th></tr>
+            <tr><td>Pass Threshold</td><td>{pass_threshold}% ({pass_mark:.1f} marks)</td></tr>
+            <tr><td>Students Passed</td><td>{passed}</td></tr>
+            <tr><td>Students Failed</td><td>{failed}</td></tr>
+            <tr><td>Pass Rate</td><td>{pass_rate:.1f}%</td></tr>
+        </table>
+
+        <h2>📊 Grade Distribution</h2>
+        <div>"""
+    
+    yield "".join(
+        f'<span class="grade-item">{grade}: {count} ({percentage:.1f}%)</span>'
+        for grade, count, percentage in grade_items
+    )
+    
+    yield f"""</div>
+
+        <h2>📈 Performance Quartiles</h2>
+        <table class="stats-table">
+            <tr><th>Quartile</th><th>Score</th></tr>
+            <tr><td>25th Percentile (Q1)</td><td>{results['q1']:.2f}</td></tr>
+            <tr><td>50th Percentile (Q2/Median)</td><td>{results['median']:.2f}</td></tr>
+            <tr><td>75th Percentile (Q3)</td><td>{results['q3']:.2f}</td></tr>
+        </table>"""
+    
+    if results.get('outlier_count', 0) > 0:
+        yield f"""
+        <div class="info-box">
+            <h3>⚠️ Additional Insights</h3>
+            <p>Outliers Detected: {results['outlier_count']} students have scores that are significantly different from the rest of the class.</p>
+        </div>"""
+    
+    yield f"""
+    </div>
+    <div class="footer">
+        <p>📋 This analysis was generated using the Exam Analysis Tool</p>
+        <p>Generated on: {generated_at}</p>
+        """
+    
+    if teacher_name:
+        yield f"<p>Teacher: {teacher_name}</p>"
+    
+    yield _HTML_CLOSE
 
 class EmailHandler:
     """Handle email sending functionality using SendGrid"""
@@ -19,7 +156,7 @@ class EmailHandler:
         """Check if SendGrid is properly configured"""
         return self.sendgrid_available
     
-    def send_analysis_email(self, to_email, from_email, subject, content, cc_emails=None):
+    def send_analysis_email(self, to_email, from_email, subject, content, cc_emails=None, html_content=None):
         """
         Send analysis results via email
         
@@ -29,6 +166,8 @@ class EmailHandler:
             subject: Email subject
             content: Email content (plain text)
             cc_emails: Optional CC email addresses (comma-separated string)
+            html_content: Optional HTML version of the content, sent in the same
+                message as a multipart/alternative part
             
         Returns:
             tuple: (success: bool, message: str)
@@ -37,34 +176,52 @@ class EmailHandler:
             return False, "SendGrid is not configured. Please set SENDGRID_API_KEY environment variable."
         
         try:
-            sg = SendGridAPIClient(self.api_key)
-            
-            # Create email message
-            message = Mail(
-                from_email=Email(from_email),
-                to_emails=To(to_email),
-                subject=subject,
-                plain_text_content=Content("text/plain", content)
-            )
+            # Plain JSON body; the SDK's Mail/Email/To/Content helpers only serialize to this
+            payload = self._build_payload(to_email, from_email, subject, content, cc_emails, html_content)
+            status_code = self._post_payload(payload)
             
-            # Add CC recipients if provided
-            if cc_emails:
-                cc_list = [email.strip() for email in cc_emails.split(',') if email.strip()]
-                for cc_email in cc_list:
-                    message.add_cc(cc_email)
-            
-            # Send email
-            response = sg.send(message)
-            
-            if response.status_code == 202:
+            if status_code == 202:
                 return True, "Email sent successfully!"
             else:
-                return False, f"Failed to send email. Status code: {response.status_code}"
+                return False, f"Failed to send email. Status code: {status_code}"
                 
         except Exception as e:
-            return False, f"Error sending email: {str(e)}"
+            return _send_error(e)
+    
+    def _post_payload(self, payload):
+        """POST a mail/send payload on the shared client and return the status code"""
+        if HTTPX_AVAILABLE:
+            # Pooled keep-alive connection, so only the first send pays for the TLS handshake
+            return _pooled_http_client(self.api_key).post("/v3/mail/send", json=payload).status_code
+        return _sendgrid_client(self.api_key).client.mail.send.post(request_body=payload).status_code
+    
+    def _build_payload(self, to_email, from_email, subject, content, cc_emails=None, html_content=None):
+        """Build the v3 mail/send JSON body for a single message, with an optional HTML part"""
+        return {
+            "personalizations": [self._build_personalization(to_email, cc_emails)],
+            "from": {"email": from_email},
+            "subject": subject,
+            "content": self._build_content(content, html_content)
+        }
     
-    def generate_html_content(self, results, marks, pass_threshold, max_marks, grades, student_info, custom_message=""):
+    def _build_content(self, content, html_content=None):
+        """Content list; SendGrid sends plain text plus HTML as one multipart/alternative message"""
+        parts = [{"type": "text/plain", "value": content}]
+        if html_content:
+            parts.append({"type": "text/html", "value": html_content})
+        return parts
+    
+    def _build_personalization(self, to_email, cc_emails=None):
+        """Build one personalization entry: recipient and optional CCs"""
+        personalization = {"to": [{"email": to_email}]}
+        if cc_emails:
+            cc_list = [email.strip() for email in cc_emails.split(',') if email.strip()]
+            if cc_list:
+                personalization["cc"] = [{"email": cc_email} for cc_email in cc_list]
+        return personalization
+    
+    def generate_html_content(self, results, marks, pass_threshold, max_marks, grades, student_info, custom_message="",
+                              generated_at=None, pass_stats=None):
         """
         Generate HTML formatted email content for better presentation
         
@@ -76,6 +233,10 @@ class EmailHandler:
             grades: Grade distribution dictionary
             student_info: Student information dictionary
             custom_message: Optional custom message from sender
+            generated_at: Optional timestamp string for the footer, so a batch of
+                renders can share one; defaults to the current time
+            pass_stats: Optional result of ExamAnalyzer.calculate_pass_fail_stats for
+                these marks; when given, the pass/fail counts are not recomputed
             
         Returns:
             str: HTML formatted email content
@@ -83,129 +244,38 @@ class EmailHandler:
         
         # Calculate pass/fail statistics
         pass_mark = (pass_threshold / 100) * max_marks
-        passed = sum(1 for mark in marks if mark >= pass_mark)
-        failed = len(marks) - passed
-        pass_rate = (passed / len(marks)) * 100
+        if pass_stats is not None:
+            passed = pass_stats['passed_count']
+            failed = pass_stats['failed_count']
+            pass_rate = pass_stats['pass_rate']
+        else:
+            marks_array = np.asarray(marks, dtype=np.float64)
+            passed = int(np.count_nonzero(marks_array >= pass_mark))
+            failed = marks_array.size - passed
+            pass_rate = (passed / marks_array.size) * 100
+        percent_per_student = 100.0 / (passed + failed)
         
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .header {{ background: linear-gradient(90deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .info-box {{ background: #f8f9fa; padding: 15px; border-left: 4px solid #667eea; margin: 15px 0; }}
-                .stats-table {{ width: 100%; border-collapse: collapse; margin: 15px 0; }}
-                .stats-table th, .stats-table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                .stats-table th {{ background-color: #f2f2f2; }}
-                .grade-item {{ display: inline-block; margin: 5px; padding: 5px 10px; background: #e3f2fd; border-radius: 5px; }}
-                .footer {{ background: #f8f9fa; padding: 15px; text-align: center; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>📊 Exam Analysis Results</h1>
-        """
+        # Escape every user-supplied text field once; numbers are formatted and need none
+        safe = {key: escape(str(value)) for key, value in (student_info or {}).items() if value}
         
-        # Add class information if available
-        if student_info:
-            if student_info.get('exam_name'):
-                html_content += f"<h2>{student_info['exam_name']}</h2>"
-            
-            class_info = []
-            if student_info.get('class_name'):
-                class_info.append(f"Class: {student_info['class_name']}")
-            if student_info.get('grade'):
-                class_info.append(f"Grade: {student_info['grade']}")
-            if student_info.get('stream'):
-                class_info.append(f"Stream: {student_info['stream']}")
-            
-            if class_info:
-                html_content += f"<p>{' | '.join(class_info)}</p>"
-        
-        html_content += """
-            </div>
-            <div class="content">
-        """
-        
-        # Add custom message if provided
-        if custom_message:
-            html_content += f"""
-                <div class="info-box">
-                    <h3>Personal Message</h3>
-                    <p>{custom_message}</p>
-                </div>
-            """
+        class_info = []
+        if safe.get('class_name'):
+            class_info.append(f"Class: {safe['class_name']}")
+        if safe.get('grade'):
+            class_info.append(f"Grade: {safe['grade']}")
+        if safe.get('stream'):
+            class_info.append(f"Stream: {safe['stream']}")
         
-        # Key statistics table
-        html_content += f"""
-            <h2>📊 Key Statistics</h2>
-            <table class="stats-table">
-                <tr><th>Metric</th><th>Value</th></tr>
-                <tr><td>Total Students</td><td>{results['count']}</td></tr>
-                <tr><td>Average Score</td><td>{results['mean']:.2f}</td></tr>
-                <tr><td>Median Score</td><td>{results['median']:.2f}</td></tr>
-                <tr><td>Highest Score</td><td>{results['max']:.2f}</td></tr>
-                <tr><td>Lowest Score</td><td>{results['min']:.2f}</td></tr>
-                <tr><td>Standard Deviation</td><td>{results['std_dev']:.2f}</td></tr>
-            </table>
-            
-            <h2>✅ Pass/Fail Analysis</h2>
-            <table class="stats-table">
-                <tr><th>Metric</th><th>Value</th></tr>
-                <tr><td>Pass Threshold</td><td>{pass_threshold}% ({pass_mark:.1f} marks)</td></tr>
-                <tr><td>Students Passed</td><td>{passed}</td></tr>
-                <tr><td>Students Failed</td><td>{failed}</td></tr>
-                <tr><td>Pass Rate</td><td>{pass_rate:.1f}%</td></tr>
-            </table>
-            
-            <h2>📊 Grade Distribution</h2>
-            <div>
-        """
-        
-        # Grade distribution
-        for grade, count in grades.items():
-            if count > 0:
-                percentage = (count / len(marks)) * 100
-                html_content += f'<span class="grade-item">{grade}: {count} ({percentage:.1f}%)</span>'
-        
-        html_content += f"""
-            </div>
-            
-            <h2>📈 Performance Quartiles</h2>
-            <table class="stats-table">
-                <tr><th>Quartile</th><th>Score</th></tr>
-                <tr><td>25th Percentile (Q1)</td><td>{results['q1']:.2f}</td></tr>
-                <tr><td>50th Percentile (Q2/Median)</td><td>{results['median']:.2f}</td></tr>
-                <tr><td>75th Percentile (Q3)</td><td>{results['q3']:.2f}</td></tr>
-            </table>
-        """
-        
-        # Additional insights
-        if results.get('outlier_count', 0) > 0:
-            html_content += f"""
-                <div class="info-box">
-                    <h3>⚠️ Additional Insights</h3>
-                    <p>Outliers Detected: {results['outlier_count']} students have scores that are significantly different from the rest of the class.</p>
-                </div>
-            """
-        
-        # Footer
-        html_content += f"""
-            </div>
-            <div class="footer">
-                <p>📋 This analysis was generated using the Exam Analysis Tool</p>
-                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        """
-        
-        if student_info and student_info.get('teacher_name'):
-            html_content += f"<p>Teacher: {student_info['teacher_name']}</p>"
-        
-        html_content += """
-            </div>
-        </body>
-        </html>
-        """
+        grade_items = [
+            (escape(str(grade)), count, count * percent_per_student)
+            for grade, count in grades.items() if count > 0
+        ]
         
-        return html_content
\ No newline at end of file
+        return "".join(_iter_analysis_html(
+            results, pass_threshold, pass_mark, passed, failed, pass_rate, grade_items,
+            exam_name=safe.get('exam_name'),
+            class_info=class_info,
+            custom_message=escape(str(custom_message)) if custom_message else "",
+            teacher_name=safe.get('teacher_name'),
+            generated_at=generated_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        ))
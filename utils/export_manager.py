@@ -1,18 +1,141 @@
 import pandas as pd
+import numpy as np
 import json
+import csv
 import io
 import zipfile
+import hashlib
 from datetime import datetime
 import streamlit as st
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics.charts.barcharts import VerticalBarChart
 import base64
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+try:
+    from pyexcelerate import Workbook as FastWorkbook
+    PYEXCELERATE_AVAILABLE = True
+except ImportError:
+    PYEXCELERATE_AVAILABLE = False
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+RANKINGS_SHEET_COLUMNS = ['Rank', 'Student Name', 'Total Score', 'Average per Subject', 'Subject Count']
+SUBJECT_SHEET_COLUMNS = ['Student Name', 'Subject', 'Score', 'Rank']
+
+RANKINGS_CSV_COLUMNS = ['Rank', 'Student Name', 'Total Score', 'Average per Subject', 'Subject Count',
+                        'Best Subject', 'Worst Subject']
+# Ranks and subject counts are small integers; scores stay float64 so values like 85.1 print unchanged
+RANKINGS_INT_DTYPES = {'Rank': 'int32', 'Subject Count': 'int16'}
+# Up to this many rows the rankings CSV is written by csv.writer; beyond it pandas' buffered writer wins
+CSV_WRITER_MAX_ROWS = 10_000
+
+# zlib level for the comprehensive export ZIP
+ZIP_COMPRESSLEVEL = 1
+# Files the comprehensive ZIP can contain, in the order export_summary.json lists them
+ZIP_MEMBER_DESCRIPTIONS = {
+    'student_data.csv': 'Individual student scores',
+    'student_rankings.csv': 'Student rankings table',
+    'rankings.parquet': 'Detailed ranking information, including per-subject scores',
+    'student_data.parquet': 'Individual student scores as Parquet',
+    'statistical_analysis.json': 'Statistical analysis results',
+    'class_information.json': 'Class and exam details'
+}
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+# ReportLab styles are immutable once built, so both PDF reports share these
+_STYLES = getSampleStyleSheet()
+# Gaps live in spaceBefore/spaceAfter rather than separate Spacer flowables
+_RANKINGS_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.darkblue,
+    spaceAfter=50,
+    alignment=1  # Center
+)
+_SUMMARY_STYLE = ParagraphStyle(
+    'Summary',
+    parent=_STYLES['Normal'],
+    fontSize=12,
+    leading=22,
+    spaceAfter=30
+)
+_REPORT_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=28,
+    textColor=colors.darkblue,
+    spaceAfter=80,
+    alignment=1
+)
+_GENERATED_STYLE = ParagraphStyle(
+    'Generated',
+    parent=_STYLES['Normal'],
+    spaceBefore=30
+)
+_REPORT_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.darkblue,
+    spaceAfter=15,
+    spaceBefore=20
+)
+# student_info fields shown on the report's cover, in display order
+_COVER_FIELDS = (
+    ('class_name', 'Class:'),
+    ('exam_name', 'Exam:'),
+    ('grade', 'Grade:'),
+    ('stream', 'Stream:'),
+    ('teacher_name', 'Teacher:'),
+    ('exam_date', 'Date:')
+)
+_RANKINGS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+_INFO_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey)
+])
+_STATS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+def _dumps_json(obj):
+    """Indented UTF-8 JSON bytes; anything not JSON-native is written as str()"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str, option=ORJSON_OPTIONS)
+    return json.dumps(obj, indent=2, default=str).encode('utf-8')
 
 class ExportManager:
     """Comprehensive export functionality for exam analysis data"""
@@ -23,52 +146,85 @@ class ExportManager:
     def export_student_rankings(self, rankings_data, format_type='csv'):
         """Export student rankings in various formats"""
         try:
-            if format_type == 'csv':
-                return self._export_rankings_csv(rankings_data)
-            elif format_type == 'excel':
-                return self._export_rankings_excel(rankings_data)
-            elif format_type == 'json':
-                return self._export_rankings_json(rankings_data)
-            elif format_type == 'pdf':
-                return self._export_rankings_pdf(rankings_data)
-            else:
-                raise ValueError(f"Unsupported format: {format_type}")
+            if format_type in ('json', 'pdf'):
+                # Both embed the export time; JSON costs no more than its fingerprint and a PDF lays out in
+                # milliseconds, so they are built fresh rather than served with a stale timestamp
+                return self._export_rankings(rankings_data, format_type)
+            return _cached_rankings_export(_export_fingerprint(rankings_data), format_type, rankings_data)
         
         except Exception as e:
             st.error(f"Export failed: {str(e)}")
             return None
     
+    def _export_rankings(self, rankings_data, format_type):
+        """Dispatch a rankings export to the writer for format_type"""
+        if format_type == 'csv':
+            return self._export_rankings_csv(rankings_data)
+        elif format_type == 'excel':
+            return self._export_rankings_excel(rankings_data)
+        elif format_type == 'json':
+            return self._export_rankings_json(rankings_data)
+        elif format_type == 'pdf':
+            return self._export_rankings_pdf(rankings_data)
+        else:
+            raise ValueError(f"Unsupported format: {format_type}")
+    
     def _export_rankings_csv(self, rankings_data):
         """Export rankings as CSV"""
-        df = pd.DataFrame([
-            {
-                'Rank': rank['rank'],
-                'Student Name': rank['student_name'],
-                'Total Score': rank['total_score'],
-                'Average per Subject': rank['average_per_subject'],
-                'Subject Count': rank['subject_count'],
-                'Best Subject': f"{rank['best_subject'][0]}: {rank['best_subject'][1]:.1f}" if rank['best_subject'] else "N/A",
-                'Worst Subject': f"{rank['worst_subject'][0]}: {rank['worst_subject'][1]:.1f}" if rank['worst_subject'] else "N/A"
-            } for rank in rankings_data
-        ])
-        
-        return df.to_csv(index=False).encode('utf-8')
+        if len(rankings_data) <= CSV_WRITER_MAX_ROWS:
+            # No DataFrame to build or infer types for; rows go straight to the stdlib writer
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerow(RANKINGS_CSV_COLUMNS)
+            writer.writerows(
+                (rank['rank'], rank['student_name'], rank['total_score'], rank['average_per_subject'],
+                 rank['subject_count'], self._format_subject(rank['best_subject']),
+                 self._format_subject(rank['worst_subject']))
+                for rank in rankings_data
+            )
+            return buffer.getvalue().encode('utf-8')
+        
+        # Built column by column, so pandas gets one list per column instead of a dict per row
+        df = pd.DataFrame({
+            'Rank': [rank['rank'] for rank in rankings_data],
+            'Student Name': [rank['student_name'] for rank in rankings_data],
+            'Total Score': [rank['total_score'] for rank in rankings_data],
+            'Average per Subject': [rank['average_per_subject'] for rank in rankings_data],
+            'Subject Count': [rank['subject_count'] for rank in rankings_data],
+            'Best Subject': [self._format_subject(rank['best_subject']) for rank in rankings_data],
+            'Worst Subject': [self._format_subject(rank['worst_subject']) for rank in rankings_data]
+        }).astype(RANKINGS_INT_DTYPES)
+        
+        return df.to_csv(index=False, lineterminator='\n').encode('utf-8')
+    
+    def _format_subject(self, subject, limit=None):
+        """Format a (subject, score) pair as 'Subject: 12.3', or N/A when missing; longer than limit is cut with '...'"""
+        if not subject:
+            return "N/A"
+        text = f"{subject[0]}: {subject[1]:.1f}"
+        if limit is not None and len(text) > limit:
+            return text[:limit] + "..."
+        return text
     
     def _export_rankings_excel(self, rankings_data):
         """Export rankings as Excel with multiple sheets"""
+        if PYEXCELERATE_AVAILABLE:
+            return self._export_rankings_excel_fast(rankings_data)
+        
         output = io.BytesIO()
+        if XLSXWRITER_AVAILABLE:
+            self._write_rankings_xlsxwriter(output, rankings_data)
+            return output.getvalue()
         
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             # Main rankings sheet
-            rankings_df = pd.DataFrame([
-                {
-                    'Rank': rank['rank'],
-                    'Student Name': rank['student_name'],
-                    'Total Score': rank['total_score'],
-                    'Average per Subject': rank['average_per_subject'],
-                    'Subject Count': rank['subject_count']
-                } for rank in rankings_data
-            ])
+            rankings_df = pd.DataFrame({
+                'Rank': [rank['rank'] for rank in rankings_data],
+                'Student Name': [rank['student_name'] for rank in rankings_data],
+                'Total Score': [rank['total_score'] for rank in rankings_data],
+                'Average per Subject': [rank['average_per_subject'] for rank in rankings_data],
+                'Subject Count': [rank['subject_count'] for rank in rankings_data]
+            }).astype(RANKINGS_INT_DTYPES)
             rankings_df.to_excel(writer, sheet_name='Rankings', index=False)
             
             # Subject-wise scores sheet
@@ -89,6 +245,57 @@ class ExportManager:
         
         return output.getvalue()
     
+    def _ranking_sheet_rows(self, rankings_data):
+        """Rows of the Rankings and Subject Scores sheets, headers first; no subject rows gives None"""
+        rankings_rows = [RANKINGS_SHEET_COLUMNS]
+        rankings_rows.extend(
+            [rank['rank'], rank['student_name'], rank['total_score'],
+             rank['average_per_subject'], rank['subject_count']]
+            for rank in rankings_data
+        )
+        
+        subject_rows = None
+        if rankings_data and 'subject_scores' in rankings_data[0]:
+            subject_rows = [SUBJECT_SHEET_COLUMNS]
+            subject_rows.extend(
+                [rank['student_name'], subject, score, rank['rank']]
+                for rank in rankings_data
+                for subject, score in rank['subject_scores'].items()
+            )
+            if len(subject_rows) == 1:
+                subject_rows = None
+        
+        return rankings_rows, subject_rows
+    
+    def _export_rankings_excel_fast(self, rankings_data):
+        """Values-only workbook via pyexcelerate, which writes the sheet XML without per-cell objects"""
+        rankings_rows, subject_rows = self._ranking_sheet_rows(rankings_data)
+        
+        workbook = FastWorkbook()
+        workbook.new_sheet('Rankings', data=rankings_rows)
+        if subject_rows:
+            workbook.new_sheet('Subject Scores', data=subject_rows)
+        
+        output = io.BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+    
+    def _write_rankings_xlsxwriter(self, output, rankings_data):
+        """Stream both ranking sheets row by row; constant_memory flushes each finished row"""
+        rankings_rows, subject_rows = self._ranking_sheet_rows(rankings_data)
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_numbers': False})
+        
+        # constant_memory only accepts rows in ascending order, so each sheet is written top to bottom
+        sheets = [('Rankings', rankings_rows)]
+        if subject_rows:
+            sheets.append(('Subject Scores', subject_rows))
+        for sheet_name, rows in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            for row, values in enumerate(rows):
+                worksheet.write_row(row, 0, values)
+        
+        workbook.close()
+    
     def _export_rankings_json(self, rankings_data):
         """Export rankings as JSON"""
         export_data = {
@@ -97,128 +304,125 @@ class ExportManager:
             'rankings': rankings_data
         }
         
-        return json.dumps(export_data, indent=2, default=str).encode('utf-8')
+        return _dumps_json(export_data)
     
     def _export_rankings_pdf(self, rankings_data):
         """Export rankings as comprehensive PDF report"""
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
         story = []
         
         # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.darkblue,
-            spaceAfter=30,
-            alignment=1  # Center
-        )
+        story.append(Paragraph("Student Rankings Report", _RANKINGS_TITLE_STYLE))
         
-        story.append(Paragraph("Student Rankings Report", title_style))
-        story.append(Spacer(1, 20))
+        # Summary information, one paragraph with a line per fact
+        story.append(Paragraph(
+            f"<b>Total Students:</b> {len(rankings_data)}<br/>"
+            f"<b>Report Generated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            _SUMMARY_STYLE
+        ))
         
-        # Summary information
-        summary_style = ParagraphStyle(
-            'Summary',
-            parent=styles['Normal'],
-            fontSize=12,
-            spaceAfter=10
-        )
-        
-        story.append(Paragraph(f"<b>Total Students:</b> {len(rankings_data)}", summary_style))
-        story.append(Paragraph(f"<b>Report Generated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", summary_style))
-        story.append(Spacer(1, 20))
-        
-        # Rankings table
+        # Rankings table, top 20 students
         table_data = [['Rank', 'Student Name', 'Total Score', 'Average', 'Best Subject']]
-        
-        for rank in rankings_data[:20]:  # Top 20 students
-            best_subject = f"{rank['best_subject'][0]}: {rank['best_subject'][1]:.1f}" if rank['best_subject'] else "N/A"
-            table_data.append([
+        table_data.extend(
+            [
                 str(rank['rank']),
                 rank['student_name'],
                 f"{rank['total_score']:.1f}",
                 f"{rank['average_per_subject']:.1f}",
-                best_subject[:20] + "..." if len(best_subject) > 20 else best_subject
-            ])
+                self._format_subject(rank['best_subject'], limit=20)
+            ] for rank in rankings_data[:20]
+        )
         
         table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        table.setStyle(_RANKINGS_TABLE_STYLE)
         
         story.append(table)
         
         # Build PDF
         doc.build(story)
-        buffer.seek(0)
         return buffer.getvalue()
     
     def export_comprehensive_analysis(self, student_data, analysis_results, rankings_data, student_info=None):
         """Export comprehensive analysis including all data"""
         try:
-            # Create ZIP file with multiple components
-            zip_buffer = io.BytesIO()
-            
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                # 1. Student data CSV
-                if student_data:
-                    student_df = pd.DataFrame.from_dict(student_data, orient='index')
-                    csv_data = student_df.to_csv().encode('utf-8')
-                    zip_file.writestr('student_data.csv', csv_data)
-                
-                # 2. Rankings data
-                if rankings_data:
-                    rankings_csv = self._export_rankings_csv(rankings_data)
-                    zip_file.writestr('student_rankings.csv', rankings_csv)
-                    
-                    rankings_json = self._export_rankings_json(rankings_data)
-                    zip_file.writestr('rankings_detailed.json', rankings_json)
-                
-                # 3. Statistical analysis results
-                if analysis_results:
-                    analysis_json = json.dumps(analysis_results, indent=2, default=str).encode('utf-8')
-                    zip_file.writestr('statistical_analysis.json', analysis_json)
-                
-                # 4. Class information
-                if student_info:
-                    info_json = json.dumps(student_info, indent=2, default=str).encode('utf-8')
-                    zip_file.writestr('class_information.json', info_json)
-                
-                # 5. Summary report
-                summary_data = {
-                    'export_timestamp': datetime.now().isoformat(),
-                    'total_students': len(student_data) if student_data else 0,
-                    'total_rankings': len(rankings_data) if rankings_data else 0,
-                    'class_info': student_info,
-                    'export_includes': [
-                        'student_data.csv - Individual student scores',
-                        'student_rankings.csv - Student rankings table',
-                        'rankings_detailed.json - Detailed ranking information',
-                        'statistical_analysis.json - Statistical analysis results',
-                        'class_information.json - Class and exam details'
-                    ]
-                }
-                
-                summary_json = json.dumps(summary_data, indent=2, default=str).encode('utf-8')
-                zip_file.writestr('export_summary.json', summary_json)
-            
-            zip_buffer.seek(0)
-            return zip_buffer.getvalue()
+            # The rankings get their own key so the ZIP can reuse the rankings panel's cached CSV
+            rankings_key = _export_fingerprint(rankings_data)
+            fingerprint = _export_fingerprint(student_data, analysis_results, student_info) + rankings_key
+            archive = _cached_comprehensive_zip(
+                fingerprint, student_data, analysis_results, rankings_data, student_info, rankings_key
+            )
+            # The summary carries the export time, so it is added after the cache lookup
+            return self._add_export_summary(archive, student_data, rankings_data, student_info)
         
         except Exception as e:
             st.error(f"Comprehensive export failed: {str(e)}")
             return None
     
+    def _build_comprehensive_zip(self, student_data, analysis_results, rankings_data, student_info=None, rankings_key=None):
+        """Build the comprehensive analysis ZIP without its export summary; errors propagate to the caller"""
+        # Create ZIP file with multiple components
+        zip_buffer = io.BytesIO()
+        
+        # Level 1 deflate: the archive is built while the user waits, so speed beats ratio
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zip_file:
+            # 1. Student data CSV, plus Parquet for analysis tools when every column has one type
+            if student_data:
+                zip_file.writestr('student_data.csv', self._student_data_csv(student_data))
+                try:
+                    student_table = self._student_data_table(student_data, name_column='Student')
+                    zip_file.writestr('student_data.parquet', self._parquet(student_table))
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    pass
+            
+            # 2. Rankings data: the spreadsheet-friendly CSV and one Parquet file with the full detail
+            if rankings_data:
+                # Same cache entry as export_student_rankings, so the CSV is built once per data
+                rankings_key = rankings_key or _export_fingerprint(rankings_data)
+                rankings_csv = _cached_rankings_export(rankings_key, 'csv', rankings_data)
+                zip_file.writestr('student_rankings.csv', rankings_csv)
+                
+                # Skipped, like student_data.parquet, when subject scores mix types (e.g. text-extracted values)
+                try:
+                    zip_file.writestr('rankings.parquet', self._parquet(self._rankings_table(rankings_data)))
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    pass
+            
+            # 3. Statistical analysis results
+            if analysis_results:
+                analysis_json = _dumps_json(analysis_results)
+                zip_file.writestr('statistical_analysis.json', analysis_json)
+            
+            # 4. Class information
+            if student_info:
+                info_json = _dumps_json(student_info)
+                zip_file.writestr('class_information.json', info_json)
+        
+        # getvalue() hands over BytesIO's own bytes object without copying, and the cache needs bytes anyway
+        return zip_buffer.getvalue()
+        
+    
+    def _add_export_summary(self, archive, student_data, rankings_data, student_info=None):
+        """Append export_summary.json, stamped with the current time, to a copy of a comprehensive ZIP"""
+        zip_buffer = io.BytesIO(archive)
+        with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESSLEVEL) as zip_file:
+            # 5. Summary report, listing only the files this archive actually contains
+            written = set(zip_file.namelist())
+            summary_data = {
+                'export_timestamp': datetime.now().isoformat(),
+                'total_students': len(student_data) if student_data else 0,
+                'total_rankings': len(rankings_data) if rankings_data else 0,
+                'class_info': student_info,
+                'export_includes': [
+                    f'{name} - {description}' for name, description in ZIP_MEMBER_DESCRIPTIONS.items() if name in written
+                ]
+            }
+            
+            summary_json = _dumps_json(summary_data)
+            zip_file.writestr('export_summary.json', summary_json)
+        
+        return zip_buffer.getvalue()
+    
     def export_historical_comparison(self, comparison_data, format_type='json'):
         """Export historical comparison data"""
         try:
@@ -228,30 +432,10 @@ class ExportManager:
                     'comparison_type': 'historical_analysis',
                     'data': comparison_data
                 }
-                return json.dumps(export_data, indent=2, default=str).encode('utf-8')
+                return _dumps_json(export_data)
             
             elif format_type == 'csv':
-                # Flatten comparison data for CSV export
-                csv_data = []
-                for student, data in comparison_data.items():
-                    row = {
-                        'Student': student,
-                        'Current_Total': data['subjects'].get('Total', {}).get('current', 0),
-                        'Previous_Total': data['subjects'].get('Total', {}).get('previous', 0),
-                        'Total_Change': data.get('total_change', 0),
-                        'Overall_Trend': data.get('overall_trend', 'stable')
-                    }
-                    
-                    # Add subject-wise changes
-                    for subject, subject_data in data['subjects'].items():
-                        if subject != 'Total':
-                            row[f'{subject}_Current'] = subject_data.get('current', 0)
-                            row[f'{subject}_Previous'] = subject_data.get('previous', 0)
-                            row[f'{subject}_Change'] = subject_data.get('change', 0)
-                    
-                    csv_data.append(row)
-                
-                df = pd.DataFrame(csv_data)
+                df = self._historical_comparison_frame(comparison_data)
                 return df.to_csv(index=False).encode('utf-8')
             
             else:
@@ -264,154 +448,191 @@ class ExportManager:
     def create_comprehensive_pdf_report(self, student_data, rankings_data, analysis_results, student_info, historical_data=None):
         """Create a comprehensive PDF report with all analysis components"""
         try:
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Custom styles
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=28,
-                textColor=colors.darkblue,
-                spaceAfter=30,
-                alignment=1
+            # Not cached: the report is stamped with its generation time and lays out in milliseconds
+            return self._build_comprehensive_pdf(
+                student_data, rankings_data, analysis_results, student_info, historical_data
             )
+        
+        except Exception as e:
+            st.error(f"PDF report generation failed: {str(e)}")
+            return None
+    
+    def _student_data_table(self, student_data, name_column=''):
+        """Arrow table of student-by-subject scores; raises when a column mixes text and numbers"""
+        # Every column seen in any student, in first-seen order, so nobody's extra subject is dropped
+        columns = list(dict.fromkeys(column for scores in student_data.values() for column in scores))
+        return pa.table({
+            name_column: list(student_data),
+            **{column: [scores.get(column) for scores in student_data.values()] for column in columns}
+        })
+    
+    def _student_data_csv(self, student_data):
+        """Student-by-subject score table as CSV, student names in the first, unnamed column"""
+        try:
+            table = self._student_data_table(student_data)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # A column mixing text and numbers has no Arrow type; let pandas write it as objects
+            return pd.DataFrame.from_dict(student_data, orient='index').to_csv().encode('utf-8')
+        
+        sink = pa.BufferOutputStream()
+        pa_csv.write_csv(table, sink, pa_csv.WriteOptions(quoting_style='needed'))
+        return sink.getvalue().to_pybytes()
+    
+    def _rankings_table(self, rankings_data):
+        """Arrow table of the rankings, best/worst subject split into name and score columns"""
+        def subject_column(key, part):
+            return [rank[key][part] if rank[key] else None for rank in rankings_data]
+        
+        columns = {
+            'Rank': pa.array([rank['rank'] for rank in rankings_data], type=pa.int32()),
+            'Student Name': [rank['student_name'] for rank in rankings_data],
+            'Total Score': [rank['total_score'] for rank in rankings_data],
+            'Average per Subject': [rank['average_per_subject'] for rank in rankings_data],
+            'Subject Count': pa.array([rank['subject_count'] for rank in rankings_data], type=pa.int16()),
+            'Best Subject': subject_column('best_subject', 0),
+            'Best Subject Score': subject_column('best_subject', 1),
+            'Worst Subject': subject_column('worst_subject', 0),
+            'Worst Subject Score': subject_column('worst_subject', 1)
+        }
+        if rankings_data and 'subject_scores' in rankings_data[0]:
+            columns['Subject Scores'] = pa.array(
+                [list(rank.get('subject_scores', {}).items()) for rank in rankings_data],
+                type=pa.map_(pa.string(), pa.float64())
+            )
+        return pa.table(columns)
+    
+    def _parquet(self, table):
+        """Parquet bytes for a table, zstd-compressed with dictionary-encoded columns"""
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression='zstd', compression_level=3, use_dictionary=True)
+        return sink.getvalue().to_pybytes()
+    
+    def _historical_comparison_frame(self, comparison_data):
+        """One row per student: totals and trend, then Current/Previous/Change for each subject"""
+        summary = pd.DataFrame({
+            'Student': list(comparison_data),
+            'Current_Total': [data['subjects'].get('Total', {}).get('current', 0) for data in comparison_data.values()],
+            'Previous_Total': [data['subjects'].get('Total', {}).get('previous', 0) for data in comparison_data.values()],
+            'Total_Change': [data.get('total_change', 0) for data in comparison_data.values()],
+            'Overall_Trend': [data.get('overall_trend', 'stable') for data in comparison_data.values()]
+        })
+        
+        # Subject changes go in long form first and are spread into columns by a single pivot
+        long_df = pd.DataFrame(
+            [
+                (student, subject, subject_data.get('current', 0), subject_data.get('previous', 0), subject_data.get('change', 0))
+                for student, data in comparison_data.items()
+                for subject, subject_data in data['subjects'].items() if subject != 'Total'
+            ],
+            columns=['Student', 'Subject', 'Current', 'Previous', 'Change']
+        )
+        if long_df.empty:
+            return summary
+        
+        # Subjects keep the order they first appear in, each with its three columns side by side
+        subjects = long_df['Subject'].unique()
+        wide = long_df.pivot(index='Student', columns='Subject').reindex(
+            columns=[(value, subject) for subject in subjects for value in ('Current', 'Previous', 'Change')]
+        )
+        wide.columns = [f'{subject}_{value}' for value, subject in wide.columns]
+        return summary.join(wide, on='Student')
+    
+    def _build_comprehensive_pdf(self, student_data, rankings_data, analysis_results, student_info, historical_data=None):
+        """Build the comprehensive PDF report; errors propagate to the caller"""
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch)
+        story = []
+        
+        # Cover page
+        story.append(Paragraph("Comprehensive Exam Analysis Report", _REPORT_TITLE_STYLE))
+        
+        # Class information
+        if student_info:
+            info_table_data = [
+                [label, str(student_info[field])] for field, label in _COVER_FIELDS if student_info.get(field)
+            ]
             
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=16,
-                textColor=colors.darkblue,
-                spaceAfter=15,
-                spaceBefore=20
+            if info_table_data:
+                info_table = Table(info_table_data, colWidths=[2*inch, 4*inch])
+                info_table.setStyle(_INFO_TABLE_STYLE)
+                story.append(info_table)
+        
+        story.append(Paragraph(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", _GENERATED_STYLE))
+        story.append(PageBreak())
+        
+        # Executive Summary
+        story.append(Paragraph("Executive Summary", _REPORT_HEADING_STYLE))
+        
+        if student_data and analysis_results:
+            total_students = len(student_data)
+            totals = np.fromiter(
+                (data.get('Total', 0) for data in student_data.values()), dtype=np.float64, count=total_students
             )
+            avg_score = totals.mean() if totals.size else 0
             
-            # Cover page
-            story.append(Paragraph("Comprehensive Exam Analysis Report", title_style))
-            story.append(Spacer(1, 50))
+            summary_text = f"""
+            This report presents a comprehensive analysis of exam results for {total_students} students.
+            The average total score across all students is {avg_score:.1f}.
             
-            # Class information
-            if student_info:
-                info_table_data = []
-                if student_info.get('class_name'):
-                    info_table_data.append(['Class:', student_info['class_name']])
-                if student_info.get('exam_name'):
-                    info_table_data.append(['Exam:', student_info['exam_name']])
-                if student_info.get('grade'):
-                    info_table_data.append(['Grade:', student_info['grade']])
-                if student_info.get('stream'):
-                    info_table_data.append(['Stream:', student_info['stream']])
-                if student_info.get('teacher_name'):
-                    info_table_data.append(['Teacher:', student_info['teacher_name']])
-                if student_info.get('exam_date'):
-                    info_table_data.append(['Date:', str(student_info['exam_date'])])
-                
-                if info_table_data:
-                    info_table = Table(info_table_data, colWidths=[2*inch, 4*inch])
-                    info_table.setStyle(TableStyle([
-                        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, -1), 12),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-                    ]))
-                    story.append(info_table)
+            Key findings include detailed statistical analysis, student rankings, 
+            and performance insights to support educational decision-making.
+            """
             
-            story.append(Spacer(1, 30))
-            story.append(Paragraph(f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-            story.append(PageBreak())
+            story.append(Paragraph(summary_text, _STYLES['Normal']))
+        
+        story.append(PageBreak())
+        
+        # Statistical Analysis
+        if analysis_results:
+            story.append(Paragraph("Statistical Analysis", _REPORT_HEADING_STYLE))
             
-            # Executive Summary
-            story.append(Paragraph("Executive Summary", heading_style))
+            stats_data = [
+                ['Metric', 'Value'],
+                ['Mean Score', f"{analysis_results.get('mean', 0):.2f}"],
+                ['Median Score', f"{analysis_results.get('median', 0):.2f}"],
+                ['Standard Deviation', f"{analysis_results.get('std_dev', 0):.2f}"],
+                ['Minimum Score', f"{analysis_results.get('min', 0):.2f}"],
+                ['Maximum Score', f"{analysis_results.get('max', 0):.2f}"]
+            ]
             
-            if student_data and analysis_results:
-                total_students = len(student_data)
-                avg_score = sum(data.get('Total', 0) for data in student_data.values()) / total_students if total_students > 0 else 0
-                
-                summary_text = f"""
-                This report presents a comprehensive analysis of exam results for {total_students} students.
-                The average total score across all students is {avg_score:.1f}.
-                
-                Key findings include detailed statistical analysis, student rankings, 
-                and performance insights to support educational decision-making.
-                """
-                
-                story.append(Paragraph(summary_text, styles['Normal']))
+            stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
+            stats_table.setStyle(_STATS_TABLE_STYLE)
             
+            story.append(stats_table)
             story.append(PageBreak())
+        
+        # Student Rankings
+        if rankings_data:
+            story.append(Paragraph("Student Rankings", _REPORT_HEADING_STYLE))
             
-            # Statistical Analysis
-            if analysis_results:
-                story.append(Paragraph("Statistical Analysis", heading_style))
-                
-                stats_data = [
-                    ['Metric', 'Value'],
-                    ['Mean Score', f"{analysis_results.get('mean', 0):.2f}"],
-                    ['Median Score', f"{analysis_results.get('median', 0):.2f}"],
-                    ['Standard Deviation', f"{analysis_results.get('std_dev', 0):.2f}"],
-                    ['Minimum Score', f"{analysis_results.get('min', 0):.2f}"],
-                    ['Maximum Score', f"{analysis_results.get('max', 0):.2f}"]
-                ]
-                
-                stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
-                stats_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                story.append(stats_table)
-                story.append(PageBreak())
+            # Top 30 students
+            ranking_table_data = [['Rank', 'Student Name', 'Total Score', 'Average/Subject']]
+            ranking_table_data.extend(
+                [
+                    str(rank['rank']),
+                    rank['student_name'],
+                    f"{rank['total_score']:.1f}",
+                    f"{rank['average_per_subject']:.1f}"
+                ] for rank in rankings_data[:30]
+            )
             
-            # Student Rankings
-            if rankings_data:
-                story.append(Paragraph("Student Rankings", heading_style))
-                
-                ranking_table_data = [['Rank', 'Student Name', 'Total Score', 'Average/Subject']]
-                
-                for rank in rankings_data[:30]:  # Top 30 students
-                    ranking_table_data.append([
-                        str(rank['rank']),
-                        rank['student_name'],
-                        f"{rank['total_score']:.1f}",
-                        f"{rank['average_per_subject']:.1f}"
-                    ])
-                
-                ranking_table = Table(ranking_table_data)
-                ranking_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                story.append(ranking_table)
+            ranking_table = Table(ranking_table_data)
+            ranking_table.setStyle(_RANKINGS_TABLE_STYLE)
             
-            # Historical comparison section
-            if historical_data:
-                story.append(PageBreak())
-                story.append(Paragraph("Historical Comparison", heading_style))
-                
-                # Add historical analysis content
-                story.append(Paragraph("This section contains comparison with previous exam results, showing student progress and improvement trends.", styles['Normal']))
+            story.append(ranking_table)
+        
+        # Historical comparison section
+        if historical_data:
+            story.append(PageBreak())
+            story.append(Paragraph("Historical Comparison", _REPORT_HEADING_STYLE))
             
-            # Build PDF
-            doc.build(story)
-            buffer.seek(0)
-            return buffer.getvalue()
+            # Add historical analysis content
+            story.append(Paragraph("This section contains comparison with previous exam results, showing student progress and improvement trends.", _STYLES['Normal']))
+        
+        # Build PDF
+        doc.build(story)
+        return buffer.getvalue()
         
-        except Exception as e:
-            st.error(f"PDF report generation failed: {str(e)}")
-            return None
     
     def create_download_link(self, data, filename, file_format):
         """Create a download link for the exported data"""
@@ -438,11 +659,35 @@ class ExportManager:
             use_container_width=True
         )
 
+def _export_fingerprint(*inputs):
+    """Short digest of the export inputs, hashed in place of the data itself by the cached builders"""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in inputs:
+        digest.update(_dumps_json(value))
+    return digest.hexdigest()
+
+# Streamlit reruns the script on every widget change; these keep unchanged exports from being rebuilt.
+# Arguments with a leading underscore are not hashed, the fingerprint stands in for them. Cached bytes must not
+# carry the export time, so timestamped exports (JSON, PDF, the ZIP's summary) are built after the lookup.
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_rankings_export(fingerprint, format_type, _rankings_data):
+    """Rankings export in format_type, cached per fingerprint"""
+    return ExportManager()._export_rankings(_rankings_data, format_type)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_comprehensive_zip(fingerprint, _student_data, _analysis_results, _rankings_data, _student_info, _rankings_key):
+    """Comprehensive analysis ZIP, cached per fingerprint"""
+    return ExportManager()._build_comprehensive_zip(
+        _student_data, _analysis_results, _rankings_data, _student_info, _rankings_key
+    )
+
 def display_export_interface(student_data=None, rankings_data=None, analysis_results=None, student_info=None, historical_data=None):
     """Display comprehensive export interface"""
     st.subheader("📤 Export & Download")
     
     export_manager = ExportManager()
+    # One timestamp per run, so files exported together share it in their names
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     # Export options
     col1, col2 = st.columns(2)
@@ -464,7 +709,6 @@ def display_export_interface(student_data=None, rankings_data=None, analysis_res
                     exported_data = export_manager.export_student_rankings(rankings_data, export_format)
                     
                     if exported_data:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         filename = f"student_rankings_{timestamp}"
                         
                         export_manager.create_download_link(exported_data, filename, export_format)
@@ -484,7 +728,6 @@ def display_export_interface(student_data=None, rankings_data=None, analysis_res
                     exported_data = export_manager.export_historical_comparison(historical_data, hist_format)
                     
                     if exported_data:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         filename = f"historical_comparison_{timestamp}"
                         
                         export_manager.create_download_link(exported_data, filename, hist_format)
@@ -502,7 +745,6 @@ def display_export_interface(student_data=None, rankings_data=None, analysis_res
                     )
                     
                     if exported_data:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         filename = f"exam_analysis_complete_{timestamp}"
                         
                         export_manager.create_download_link(exported_data, filename, 'zip')
@@ -517,7 +759,6 @@ def display_export_interface(student_data=None, rankings_data=None, analysis_res
                     )
                     
                     if pdf_data:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                         filename = f"exam_analysis_report_{timestamp}"
                         
                         export_manager.create_download_link(pdf_data, filename, 'pdf')
@@ -0,0 +1,25 @@
+import numpy as np
+
+# Lower percentage bound of each grade above F, and the labels for np.digitize buckets
+GRADE_BINS = np.array([35, 45, 55, 65, 75, 85, 95])
+GRADE_LABELS = np.array(['F', 'D', 'C', 'C+', 'B', 'B+', 'A', 'A+'])
+
+def grade_buckets(marks, max_marks=100):
+    """Index into GRADE_LABELS of each mark's grade, 0 (F) up to 7 (A+)"""
+    # float64 so a mark just under a grade bound can't round onto it
+    percentages = (np.asarray(marks, dtype=np.float64) / max_marks) * 100
+    # digitize puts NaN past the last bin (A+); a missing mark grades F, as the old if/elif chains did
+    return np.where(np.isnan(percentages), 0, np.digitize(percentages, GRADE_BINS))
+
+def grade_array(marks, max_marks=100):
+    """Letter grade of each mark, as an array"""
+    return GRADE_LABELS[grade_buckets(marks, max_marks)]
+
+def letter_grade(mark, max_marks=100):
+    """Letter grade of a single mark"""
+    return str(GRADE_LABELS[grade_buckets(mark, max_marks)])
+
+def grade_counts(marks, max_marks=100):
+    """Number of marks in each grade, highest grade first"""
+    bucket_counts = np.bincount(grade_buckets(marks, max_marks).ravel(), minlength=len(GRADE_LABELS))
+    return dict(zip(GRADE_LABELS[::-1].tolist(), bucket_counts[::-1].tolist()))
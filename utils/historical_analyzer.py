@@ -1,5 +1,7 @@
 import pandas as pd
 import numpy as np
+import hashlib
+import json
 from datetime import datetime
 import streamlit as st
 
@@ -25,13 +27,22 @@ class HistoricalAnalyzer:
         
         exam_record = {
             'date': exam_date,
-            'student_data': student_data,
-            'stored_at': datetime.now().isoformat()
+            'stored_at': datetime.now().isoformat(),
+            # Stored exams never change, so they are kept only as the score frame comparisons read:
+            # one float block instead of a dict per student held for the rest of the session
+            'frame': self._to_frame(student_data)
         }
         
         st.session_state.historical_exams[exam_name] = exam_record
         return True
     
+    def _get_frame(self, exam_name):
+        """Score frame of a stored exam; records stored as nested dicts are converted on first use"""
+        exam_record = st.session_state.historical_exams[exam_name]
+        if 'frame' not in exam_record:
+            exam_record['frame'] = self._to_frame(exam_record.pop('student_data'))
+        return exam_record['frame']
+    
     def get_stored_exams(self):
         """Get list of stored exam names"""
         return list(st.session_state.historical_exams.keys())
@@ -50,52 +61,71 @@ class HistoricalAnalyzer:
         if previous_exam_name not in st.session_state.historical_exams:
             return None
         
-        previous_data = st.session_state.historical_exams[previous_exam_name]['student_data']
+        # Students and subjects present in both exams, aligned so each comparison is one array operation
+        current_df = self._to_frame(current_student_data)
+        previous_df = self._get_frame(previous_exam_name)
+        students = current_df.index[current_df.index.isin(previous_df.index)]
+        shared_subjects = current_df.columns[current_df.columns.isin(previous_df.columns)]
+        current_df = current_df.loc[students, shared_subjects]
+        previous_df = previous_df.loc[students, shared_subjects]
+        subjects = shared_subjects.tolist()
+        current = current_df.to_numpy()
+        previous = previous_df.to_numpy()
+        
+        change = current - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage_change = np.where(previous > 0, change / previous * 100, 0.0)
+        # A NaN means the student has no score for that subject in one of the exams
+        compared = ~(np.isnan(current) | np.isnan(previous))
+        subject_columns = np.array([subject != 'Total' for subject in subjects], dtype=bool)
+        improved = compared & (change > 0) & subject_columns
+        declined = compared & (change < 0) & subject_columns
+        
+        if 'Total' in subjects:
+            total_column = subjects.index('Total')
+            has_total = compared[:, total_column]
+            total_change = np.where(has_total, change[:, total_column], 0.0)
+        else:
+            has_total = np.zeros(len(current_df), dtype=bool)
+            total_change = np.zeros(len(current_df))
+        overall_trend = np.select([total_change > 5, total_change < -5], ['improved', 'declined'], default='stable')
+        
+        # Only building the nested result is left to Python
+        rows = zip(
+            current_df.index, current.tolist(), previous.tolist(), change.tolist(), percentage_change.tolist(),
+            compared.tolist(), improved, declined
+        )
         progress_data = {}
-        
-        for student, current_scores in current_student_data.items():
-            if student in previous_data:
-                student_progress = {
-                    'student_name': student,
-                    'subjects': {},
-                    'total_change': 0,
-                    'improved_subjects': [],
-                    'declined_subjects': [],
-                    'overall_trend': 'stable'
-                }
-                
-                # Compare subject-wise
-                for subject, current_score in current_scores.items():
-                    if subject in previous_data[student]:
-                        previous_score = previous_data[student][subject]
-                        change = current_score - previous_score
-                        percentage_change = (change / previous_score) * 100 if previous_score > 0 else 0
-                        
-                        student_progress['subjects'][subject] = {
-                            'current': current_score,
-                            'previous': previous_score,
-                            'change': change,
-                            'percentage_change': percentage_change
-                        }
-                        
-                        if subject == 'Total':
-                            student_progress['total_change'] = change
-                            student_progress['total_percentage_change'] = percentage_change
-                        elif change > 0:
-                            student_progress['improved_subjects'].append(subject)
-                        elif change < 0:
-                            student_progress['declined_subjects'].append(subject)
-                
-                # Determine overall trend
-                if student_progress['total_change'] > 5:
-                    student_progress['overall_trend'] = 'improved'
-                elif student_progress['total_change'] < -5:
-                    student_progress['overall_trend'] = 'declined'
-                
-                progress_data[student] = student_progress
+        for row, (student, current_row, previous_row, change_row, percentage_row, compared_row,
+                  improved_row, declined_row) in enumerate(rows):
+            student_progress = {
+                'student_name': student,
+                'subjects': {
+                    subjects[col]: {
+                        'current': current_row[col],
+                        'previous': previous_row[col],
+                        'change': change_row[col],
+                        'percentage_change': percentage_row[col]
+                    }
+                    for col, is_compared in enumerate(compared_row) if is_compared
+                },
+                'total_change': float(total_change[row]),
+                'improved_subjects': [subjects[col] for col in np.flatnonzero(improved_row)],
+                'declined_subjects': [subjects[col] for col in np.flatnonzero(declined_row)],
+                'overall_trend': str(overall_trend[row])
+            }
+            if has_total[row]:
+                student_progress['total_percentage_change'] = percentage_row[total_column]
+            
+            progress_data[student] = student_progress
         
         return progress_data
     
+    def _to_frame(self, student_data):
+        """Students x subjects score frame; a subject a student has no score for is NaN"""
+        # from_dict drops students with no scores at all; keep them as all-NaN rows
+        return pd.DataFrame.from_dict(student_data, orient='index', dtype=np.float64).reindex(list(student_data))
+    
     def calculate_subject_averages_comparison(self, current_student_data, previous_exam_name):
         """
         Compare subject averages between current and previous exam
@@ -106,44 +136,31 @@ class HistoricalAnalyzer:
         if previous_exam_name not in st.session_state.historical_exams:
             return None
         
-        previous_data = st.session_state.historical_exams[previous_exam_name]['student_data']
-        
-        # Calculate current averages
-        current_subjects = {}
-        for student, scores in current_student_data.items():
-            for subject, score in scores.items():
-                if subject not in current_subjects:
-                    current_subjects[subject] = []
-                current_subjects[subject].append(score)
-        
-        current_averages = {subject: np.mean(scores) for subject, scores in current_subjects.items()}
-        
-        # Calculate previous averages
-        previous_subjects = {}
-        for student, scores in previous_data.items():
-            for subject, score in scores.items():
-                if subject not in previous_subjects:
-                    previous_subjects[subject] = []
-                previous_subjects[subject].append(score)
+        # Column means skip NaN, so each subject averages only the students who sat it
+        current_averages = self._to_frame(current_student_data).mean()
+        previous_averages = self._get_frame(previous_exam_name).mean()
+        current_averages = current_averages[current_averages.index.isin(previous_averages.index)]
+        previous_averages = previous_averages.reindex(current_averages.index)
         
-        previous_averages = {subject: np.mean(scores) for subject, scores in previous_subjects.items()}
+        current = current_averages.to_numpy()
+        previous = previous_averages.to_numpy()
+        change = current - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage_change = np.where(previous > 0, change / previous * 100, 0.0)
+        trend = np.select([change > 0, change < 0], ['improved', 'declined'], default='stable')
         
-        # Compare averages
         comparison = {}
-        for subject in current_averages:
-            if subject in previous_averages:
-                current_avg = current_averages[subject]
-                previous_avg = previous_averages[subject]
-                change = current_avg - previous_avg
-                percentage_change = (change / previous_avg) * 100 if previous_avg > 0 else 0
-                
-                comparison[subject] = {
-                    'current_average': current_avg,
-                    'previous_average': previous_avg,
-                    'change': change,
-                    'percentage_change': percentage_change,
-                    'trend': 'improved' if change > 0 else 'declined' if change < 0 else 'stable'
-                }
+        for subject, current_avg, previous_avg, subject_change, subject_percentage, subject_trend in zip(
+            current_averages.index, current.tolist(), previous.tolist(), change.tolist(),
+            percentage_change.tolist(), trend.tolist()
+        ):
+            comparison[subject] = {
+                'current_average': current_avg,
+                'previous_average': previous_avg,
+                'change': subject_change,
+                'percentage_change': subject_percentage,
+                'trend': subject_trend
+            }
         
         return comparison
     
@@ -154,26 +171,25 @@ class HistoricalAnalyzer:
         Returns:
             dict: Subject -> list of top 3 students
         """
-        subject_leaders = {}
+        return _cached_subject_leaders(_data_fingerprint(student_data), exclude_total, student_data)
+    
+    def _subject_leaders(self, student_data, exclude_total):
+        """Subject leaders of student_data, uncached"""
+        scores_df = self._to_frame(student_data)
+        if exclude_total:
+            scores_df = scores_df.drop(columns='Total', errors='ignore')
         
-        # Collect all subjects
-        all_subjects = set()
-        for student_scores in student_data.values():
-            all_subjects.update(student_scores.keys())
+        scores = scores_df.to_numpy()
+        names = scores_df.index.to_numpy()
+        # One stable sort over every subject column at once: ties keep input order and missing
+        # scores (NaN) sort last, so only a top-3 cut and the NaN trim are left per subject
+        top = np.argsort(-scores, axis=0, kind='stable')[:3]
         
-        if exclude_total:
-            all_subjects.discard('Total')
-        
-        # Find leaders for each subject
-        for subject in all_subjects:
-            subject_scores = []
-            for student, scores in student_data.items():
-                if subject in scores:
-                    subject_scores.append((student, scores[subject]))
-            
-            # Sort by score (highest first) and get top 3
-            subject_scores.sort(key=lambda x: x[1], reverse=True)
-            subject_leaders[subject] = subject_scores[:3]
+        subject_leaders = {}
+        for col, subject in enumerate(scores_df.columns):
+            rows = top[:, col]
+            rows = rows[~np.isnan(scores[rows, col])]
+            subject_leaders[subject] = list(zip(names[rows].tolist(), scores[rows, col].tolist()))
         
         return subject_leaders
     
@@ -184,6 +200,10 @@ class HistoricalAnalyzer:
         Returns:
             list: Top students with their scores
         """
+        return _cached_overall_top_students(_data_fingerprint(student_data), top_n, student_data)
+    
+    def _overall_top_students(self, student_data, top_n):
+        """Top N students by total, uncached"""
         total_scores = []
         for student, scores in student_data.items():
             if 'Total' in scores:
@@ -199,32 +219,48 @@ class HistoricalAnalyzer:
         Returns:
             list: Ranked students with detailed information
         """
-        rankings = []
+        return _cached_comprehensive_ranking(_data_fingerprint(student_data), student_data)
+    
+    def _comprehensive_ranking(self, student_data):
+        """Comprehensive ranking of student_data, uncached"""
+        ranked_data = {student: scores for student, scores in student_data.items() if 'Total' in scores}
+        scores_df = self._to_frame(ranked_data)
+        if scores_df.empty:
+            return []
+        
+        totals = scores_df.pop('Total').to_numpy()
+        subjects = scores_df.columns
+        scores = scores_df.to_numpy()
+        
+        # Row-wise metrics over the subject columns; a missing subject is NaN and is left out
+        subject_counts = np.count_nonzero(~np.isnan(scores), axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            averages = np.where(subject_counts > 0, totals / subject_counts, 0)
+        best_columns = np.argmax(np.where(np.isnan(scores), -np.inf, scores), axis=1)
+        worst_columns = np.argmin(np.where(np.isnan(scores), np.inf, scores), axis=1)
+        
+        # Highest total first; the stable sort keeps input order between equal totals
+        order = np.argsort(-totals, kind='stable')
         
-        # Calculate additional metrics for each student
-        for student, scores in student_data.items():
-            if 'Total' in scores:
-                total_score = scores['Total']
-                subject_scores = {k: v for k, v in scores.items() if k != 'Total'}
-                
-                ranking_data = {
-                    'student_name': student,
-                    'total_score': total_score,
-                    'subject_count': len(subject_scores),
-                    'average_per_subject': total_score / len(subject_scores) if subject_scores else 0,
-                    'best_subject': max(subject_scores.items(), key=lambda x: x[1]) if subject_scores else None,
-                    'worst_subject': min(subject_scores.items(), key=lambda x: x[1]) if subject_scores else None,
-                    'subject_scores': subject_scores
-                }
-                
-                rankings.append(ranking_data)
-        
-        # Sort by total score
-        rankings.sort(key=lambda x: x['total_score'], reverse=True)
-        
-        # Add rank numbers
-        for i, ranking in enumerate(rankings):
-            ranking['rank'] = i + 1
+        rankings = []
+        for rank, row in enumerate(order.tolist(), 1):
+            student = scores_df.index[row]
+            student_scores = ranked_data[student]
+            subject_scores = {k: v for k, v in student_scores.items() if k != 'Total'}
+            has_subjects = subject_counts[row] > 0
+            best_subject = subjects[best_columns[row]]
+            worst_subject = subjects[worst_columns[row]]
+            
+            rankings.append({
+                'student_name': student,
+                'total_score': student_scores['Total'],
+                'subject_count': int(subject_counts[row]),
+                'average_per_subject': float(averages[row]),
+                'best_subject': (best_subject, subject_scores[best_subject]) if has_subjects else None,
+                'worst_subject': (worst_subject, subject_scores[worst_subject]) if has_subjects else None,
+                'subject_scores': subject_scores,
+                'rank': rank
+            })
         
         return rankings
     
@@ -246,34 +282,50 @@ class HistoricalAnalyzer:
             'overall_class_trend': 'stable'
         }
         
-        # Find most improved and declined
-        max_improvement = float('-inf')
-        max_decline = float('inf')
+        students = list(progress_data)
+        total_changes = np.fromiter(
+            (data.get('total_change', 0) for data in progress_data.values()), dtype=np.float64, count=len(students)
+        )
         
-        total_changes = []
+        # argmax/argmin return the first student on a tie, as the old strict comparisons did
+        most_improved = int(total_changes.argmax())
+        most_declined = int(total_changes.argmin())
+        insights['most_improved'] = (students[most_improved], total_changes[most_improved].item())
+        insights['most_declined'] = (students[most_declined], total_changes[most_declined].item())
         
-        for student, data in progress_data.items():
-            total_change = data.get('total_change', 0)
-            total_changes.append(total_change)
-            
-            if total_change > max_improvement:
-                max_improvement = total_change
-                insights['most_improved'] = (student, total_change)
-            
-            if total_change < max_decline:
-                max_decline = total_change
-                insights['most_declined'] = (student, total_change)
-            
-            # Consistent performers (small change)
-            if abs(total_change) <= 5:
-                insights['consistent_performers'].append(student)
+        # Consistent performers (small change)
+        insights['consistent_performers'] = [
+            student for student, consistent in zip(students, np.abs(total_changes) <= 5) if consistent
+        ]
         
         # Overall class trend
-        if total_changes:
-            avg_change = np.mean(total_changes)
-            if avg_change > 2:
-                insights['overall_class_trend'] = 'improving'
-            elif avg_change < -2:
-                insights['overall_class_trend'] = 'declining'
-        
-        return insights
\ No newline at end of file
+        avg_change = total_changes.mean()
+        if avg_change > 2:
+            insights['overall_class_trend'] = 'improving'
+        elif avg_change < -2:
+            insights['overall_class_trend'] = 'declining'
+        
+        return insights
+
+def _data_fingerprint(student_data):
+    """Short digest of a student -> {subject: score} dict, hashed in place of the data by the cached helpers"""
+    # NumPy scalars (np.int64 totals, np.float32 scores) aren't JSON-native; sorted keys so equal dicts share a digest
+    serialized = json.dumps(student_data, default=float, sort_keys=True)
+    return hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+
+# Analysing the same exam again reuses its leaders and rankings instead of re-sorting every student.
+# Arguments with a leading underscore are not hashed, the fingerprint stands in for them.
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_subject_leaders(fingerprint, exclude_total, _student_data):
+    """Subject leaders, cached per fingerprint"""
+    return HistoricalAnalyzer()._subject_leaders(_student_data, exclude_total)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_overall_top_students(fingerprint, top_n, _student_data):
+    """Top N students by total, cached per fingerprint"""
+    return HistoricalAnalyzer()._overall_top_students(_student_data, top_n)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_comprehensive_ranking(fingerprint, _student_data):
+    """Comprehensive ranking, cached per fingerprint"""
+    return HistoricalAnalyzer()._comprehensive_ranking(_student_data)
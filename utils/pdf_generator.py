@@ -1,13 +1,45 @@
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-from reportlab.graphics.charts.piecharts import Pie
 from datetime import datetime
 import io
+import numpy as np
+
+from utils.grading import grade_counts
+
+# TableStyle objects are only read by setStyle, so every report shares these
+_CLASS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+def _header_table_style(header_font_size, body_font_size=None):
+    """Grey-header, beige-body grid style the report's data tables share"""
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]
+    if body_font_size is not None:
+        commands.append(('FONTSIZE', (0, 1), (-1, -1), body_font_size))
+    return TableStyle(commands)
+
+_STATS_TABLE_STYLE = _header_table_style(12)
+# Rankings and subject tables can run long, so their body text is smaller
+_LISTING_TABLE_STYLE = _header_table_style(11, body_font_size=9)
+_GRADE_TABLE_STYLE = _header_table_style(11)
 
 class PDFGenerator:
     """Generate PDF reports for exam analysis"""
@@ -62,6 +94,9 @@ class PDFGenerator:
         Returns:
             bytes: PDF content as bytes
         """
+        # Converted once; the pass rate and the grade distribution both read this array
+        marks_array = np.asarray(marks, dtype=np.float64)
+        
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72,
                               topMargin=72, bottomMargin=18)
@@ -90,15 +125,7 @@ class PDFGenerator:
             
             if class_data:
                 class_table = Table(class_data, colWidths=[1.5*inch, 3*inch])
-                class_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
+                class_table.setStyle(_CLASS_TABLE_STYLE)
                 story.append(class_table)
                 story.append(Spacer(1, 20))
         
@@ -113,20 +140,11 @@ class PDFGenerator:
             ['Highest Score', f"{results['max']:.2f}"],
             ['Lowest Score', f"{results['min']:.2f}"],
             ['Standard Deviation', f"{results['std_dev']:.2f}"],
-            ['Pass Rate', f"{self._calculate_pass_rate(marks, pass_threshold, max_marks):.1f}%"]
+            ['Pass Rate', f"{self._calculate_pass_rate(marks_array, pass_threshold, max_marks):.1f}%"]
         ]
         
         stats_table = Table(stats_data, colWidths=[2.5*inch, 2*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        stats_table.setStyle(_STATS_TABLE_STYLE)
         story.append(stats_table)
         story.append(Spacer(1, 20))
         
@@ -144,8 +162,8 @@ class PDFGenerator:
         
         # Grade Distribution
         story.append(Paragraph("Grade Distribution", self.styles['SectionHeader']))
-        grades = self._calculate_grades(marks, max_marks)
-        self._add_grade_distribution_table(story, grades, len(marks))
+        grades = self._calculate_grades(marks_array, max_marks)
+        self._add_grade_distribution_table(story, grades, marks_array.size)
         
         # Footer
         story.append(Spacer(1, 30))
@@ -172,17 +190,7 @@ class PDFGenerator:
             ])
         
         ranking_table = Table(ranking_data, colWidths=[0.8*inch, 2.5*inch, 1*inch, 0.8*inch])
-        ranking_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9)
-        ]))
+        ranking_table.setStyle(_LISTING_TABLE_STYLE)
         story.append(ranking_table)
     
     def _add_subject_analysis(self, story, subject_totals):
@@ -199,17 +207,7 @@ class PDFGenerator:
             ])
         
         subject_table = Table(subject_data, colWidths=[1.5*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-        subject_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 9)
-        ]))
+        subject_table.setStyle(_LISTING_TABLE_STYLE)
         story.append(subject_table)
     
     def _add_grade_distribution_table(self, story, grades, total_students):
@@ -222,46 +220,15 @@ class PDFGenerator:
                 grade_data.append([grade, str(count), f"{percentage:.1f}%"])
         
         grade_table = Table(grade_data, colWidths=[1*inch, 1*inch, 1.5*inch])
-        grade_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        grade_table.setStyle(_GRADE_TABLE_STYLE)
         story.append(grade_table)
     
     def _calculate_pass_rate(self, marks, pass_threshold, max_marks):
-        """Calculate pass rate"""
+        """Calculate pass rate from a float array of marks"""
         pass_mark = (pass_threshold / 100) * max_marks
-        passed = sum(1 for mark in marks if mark >= pass_mark)
-        return (passed / len(marks)) * 100 if marks else 0
+        passed = np.count_nonzero(marks >= pass_mark)
+        return (passed / marks.size) * 100 if marks.size else 0
     
     def _calculate_grades(self, marks, max_marks=100):
         """Calculate grade distribution"""
-        grades = {'A+': 0, 'A': 0, 'B+': 0, 'B': 0, 'C+': 0, 'C': 0, 'D': 0, 'F': 0}
-        
-        for mark in marks:
-            percentage = (mark / max_marks) * 100
-            
-            if percentage >= 95:
-                grades['A+'] += 1
-            elif percentage >= 85:
-                grades['A'] += 1
-            elif percentage >= 75:
-                grades['B+'] += 1
-            elif percentage >= 65:
-                grades['B'] += 1
-            elif percentage >= 55:
-                grades['C+'] += 1
-            elif percentage >= 45:
-                grades['C'] += 1
-            elif percentage >= 35:
-                grades['D'] += 1
-            else:
-                grades['F'] += 1
-        
-        return grades
\ No newline at end of file
+        return grade_counts(marks, max_marks)
@@ -1,6 +1,11 @@
 import pandas as pd
 import numpy as np
 
+from utils.grading import grade_array, letter_grade
+
+# Subject totals only count marks whose str() is digits with at most one dot, e.g. '85', '85.5', '.5'
+PLAIN_MARK_PATTERN = r'\d+\.?\d*|\.\d+'
+
 class RankingSystem:
     """Handle student ranking and subject-wise analysis"""
     
@@ -22,36 +27,32 @@ class RankingSystem:
         if not marks:
             return []
         
-        # Create student data
-        students = []
-        for i, mark in enumerate(marks):
-            name = student_names[i] if student_names and i < len(student_names) and student_names[i] else f"Student {i+1}"
-            students.append({
-                'name': name,
-                'score': float(mark),
-                'grade': self._get_letter_grade(mark, max_marks)
-            })
-        
-        # Sort by score (descending)
-        students.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Assign ranks (handle ties)
-        rankings = []
-        current_rank = 1
-        
-        for i, student in enumerate(students):
-            if i > 0 and students[i-1]['score'] != student['score']:
-                current_rank = i + 1
-            
-            rankings.append({
-                'rank': current_rank,
-                'student_name': student['name'],
-                'score': student['score'],
-                'grade': student['grade'],
-                'percentage': (student['score'] / max_marks) * 100
-            })
-        
-        return rankings
+        names = [
+            student_names[i] if student_names and i < len(student_names) and student_names[i] else f"Student {i+1}"
+            for i in range(len(marks))
+        ]
+        scores = np.asarray(marks, dtype=np.float64)
+        
+        # Highest score first; the stable sort keeps input order between equal scores
+        order = np.argsort(-scores, kind='stable')
+        sorted_scores = scores[order]
+        percentages = (sorted_scores / max_marks) * 100
+        grade_labels = grade_array(sorted_scores, max_marks)
+        
+        ranks = self._competition_ranks(sorted_scores)
+        
+        return [
+            {
+                'rank': rank,
+                'student_name': names[i],
+                'score': score,
+                'grade': grade,
+                'percentage': percentage
+            }
+            for i, rank, score, grade, percentage in zip(
+                order.tolist(), ranks.tolist(), sorted_scores.tolist(), grade_labels.tolist(), percentages.tolist()
+            )
+        ]
     
     def calculate_subject_totals(self, subject_data):
         """
@@ -66,23 +67,27 @@ class RankingSystem:
         if not subject_data:
             return {}
         
-        analysis = {}
+        # Only plain non-negative numbers count as marks; signs, exponents, padding, bools and nan are skipped
+        valid = self._plain_marks_frame(subject_data)
         
-        for subject, marks in subject_data.items():
-            if marks:
-                valid_marks = [float(mark) for mark in marks if mark is not None and str(mark).replace('.', '').isdigit()]
-                
-                if valid_marks:
-                    analysis[subject] = {
-                        'total': sum(valid_marks),
-                        'average': np.mean(valid_marks),
-                        'highest': max(valid_marks),
-                        'lowest': min(valid_marks),
-                        'count': len(valid_marks),
-                        'std_dev': np.std(valid_marks) if len(valid_marks) > 1 else 0
-                    }
-        
-        return analysis
+        # Every statistic is one column-wise reduction across all subjects at once
+        counts = valid.count()
+        stats = zip(
+            valid.columns, valid.sum(), valid.mean(), valid.max(), valid.min(), counts.tolist(), valid.std(ddof=0)
+        )
+        
+        return {
+            subject: {
+                'total': total,
+                'average': average,
+                'highest': highest,
+                'lowest': lowest,
+                'count': count,
+                'std_dev': std_dev if count > 1 else 0
+            }
+            for subject, total, average, highest, lowest, count, std_dev in stats
+            if count > 0
+        }
     
     def create_overall_ranking(self, subject_data, student_names=None):
         """
@@ -98,56 +103,62 @@ class RankingSystem:
         if not subject_data:
             return []
         
-        # Get number of students
-        num_students = max(len(marks) for marks in subject_data.values()) if subject_data else 0
+        marks_df = self._marks_frame(subject_data)
+        num_students = len(marks_df)
         
         if num_students == 0:
             return []
         
-        # Calculate total marks for each student
-        student_totals = []
-        
-        for i in range(num_students):
-            name = student_names[i] if student_names and i < len(student_names) and student_names[i] else f"Student {i+1}"
-            total_marks = 0
-            subject_count = 0
-            
-            for subject, marks in subject_data.items():
-                if i < len(marks) and marks[i] is not None:
-                    try:
-                        total_marks += float(marks[i])
-                        subject_count += 1
-                    except (ValueError, TypeError):
-                        continue
-            
-            if subject_count > 0:
-                student_totals.append({
-                    'name': name,
-                    'total_marks': total_marks,
-                    'average': total_marks / subject_count,
-                    'subjects_count': subject_count
-                })
-        
-        # Sort by total marks (descending)
-        student_totals.sort(key=lambda x: x['total_marks'], reverse=True)
-        
-        # Assign ranks
-        rankings = []
-        current_rank = 1
-        
-        for i, student in enumerate(student_totals):
-            if i > 0 and student_totals[i-1]['total_marks'] != student['total_marks']:
-                current_rank = i + 1
-            
-            rankings.append({
-                'rank': current_rank,
-                'student_name': student['name'],
-                'total_marks': student['total_marks'],
-                'average': student['average'],
-                'subjects_count': student['subjects_count']
-            })
-        
-        return rankings
+        names = [
+            student_names[i] if student_names and i < len(student_names) and student_names[i] else f"Student {i+1}"
+            for i in range(num_students)
+        ]
+        # cumsum adds strictly left to right, so totals (and ties between them) match a plain running sum
+        total_marks = np.nan_to_num(marks_df.to_numpy(dtype=np.float64)).cumsum(axis=1)[:, -1]
+        subjects_count = marks_df.count(axis=1).to_numpy()
+        
+        # Students without a single numeric mark are not ranked
+        ranked = np.flatnonzero(subjects_count > 0)
+        # Highest total first; the stable sort keeps input order between equal totals
+        order = ranked[np.argsort(-total_marks[ranked], kind='stable')]
+        sorted_totals = total_marks[order]
+        averages = sorted_totals / subjects_count[order]
+        ranks = self._competition_ranks(sorted_totals)
+        
+        return [
+            {
+                'rank': rank,
+                'student_name': names[i],
+                'total_marks': total,
+                'average': average,
+                'subjects_count': count
+            }
+            for i, rank, total, average, count in zip(
+                order.tolist(), ranks.tolist(), sorted_totals.tolist(), averages.tolist(),
+                subjects_count[order].tolist()
+            )
+        ]
+    
+    def _marks_frame(self, subject_data):
+        """Students x subjects float frame, NaN where a subject has fewer marks or a mark isn't numeric"""
+        return pd.concat(
+            {subject: pd.to_numeric(pd.Series(marks, dtype=object), errors='coerce') for subject, marks in subject_data.items()},
+            axis=1
+        ).astype(np.float64)
+    
+    def _plain_marks_frame(self, subject_data):
+        """Students x subjects float frame, NaN wherever a mark doesn't match PLAIN_MARK_PATTERN"""
+        columns = {}
+        for subject, marks in subject_data.items():
+            text = pd.Series(marks, dtype=object).astype(str)
+            columns[subject] = pd.to_numeric(text.where(text.str.fullmatch(PLAIN_MARK_PATTERN)), errors='coerce')
+        return pd.concat(columns, axis=1).astype(np.float64)
+    
+    def _competition_ranks(self, sorted_values):
+        """Ranks for values sorted best first; ties share the rank of the first of them (1, 2, 2, 4, ...)"""
+        starts_group = np.ones(len(sorted_values), dtype=bool)
+        starts_group[1:] = sorted_values[1:] != sorted_values[:-1]
+        return np.maximum.accumulate(np.where(starts_group, np.arange(1, len(sorted_values) + 1), 0))
     
     def create_subject_wise_ranking(self, subject_data, student_names=None, max_marks_per_subject=100):
         """
@@ -173,24 +184,7 @@ class RankingSystem:
     
     def _get_letter_grade(self, mark, max_marks=100):
         """Convert numeric mark to letter grade"""
-        percentage = (mark / max_marks) * 100
-        
-        if percentage >= 95:
-            return 'A+'
-        elif percentage >= 85:
-            return 'A'
-        elif percentage >= 75:
-            return 'B+'
-        elif percentage >= 65:
-            return 'B'
-        elif percentage >= 55:
-            return 'C+'
-        elif percentage >= 45:
-            return 'C'
-        elif percentage >= 35:
-            return 'D'
-        else:
-            return 'F'
+        return letter_grade(mark, max_marks)
     
     def get_class_performance_summary(self, rankings):
         """
@@ -218,8 +212,9 @@ class RankingSystem:
     
     def _calculate_grade_distribution(self, rankings):
         """Calculate grade distribution from rankings"""
-        grade_counts = {}
-        for ranking in rankings:
-            grade = ranking['grade']
-            grade_counts[grade] = grade_counts.get(grade, 0) + 1
-        return grade_counts
\ No newline at end of file
+        grades, first_seen, counts = np.unique(
+            [ranking['grade'] for ranking in rankings], return_index=True, return_counts=True
+        )
+        # np.unique sorts the labels; keep them in the order they first appear, best grade first
+        order = np.argsort(first_seen)
+        return dict(zip(grades[order].tolist(), counts[order].tolist()))
\ No newline at end of file
@@ -2,42 +2,80 @@ import streamlit as st
 import uuid
 from datetime import datetime, timedelta
 import hashlib
+import heapq
+import hmac
 import secrets
-from utils.database_manager import DatabaseManager
+from collections import Counter
+from utils.database_manager import get_database_manager
+
+# scrypt cost (n: CPU/memory, r: block size, p: parallelism); about 16 MiB and tens of ms per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Seconds a user's session list is reused across reruns before it is read from the database again
+SESSION_LIST_TTL = 30
+
+# Seconds a username lookup is reused, and the least time between last-active writes for one user
+USER_LOOKUP_TTL = 15
+ACTIVITY_WRITE_INTERVAL = 60
+
+# Per-browser-session keys UserManager owns, with their initial values
+SESSION_STATE_DEFAULTS = {
+    'user_authenticated': False,
+    'current_user': None,
+    'current_session_id': None,
+}
 
 class UserManager:
     """Multi-user session management and authentication"""
     
     def __init__(self):
-        self.db_manager = DatabaseManager()
+        self.db_manager = get_database_manager()
         
-        # Initialize session state for multi-user support
-        if 'user_authenticated' not in st.session_state:
-            st.session_state.user_authenticated = False
-        if 'current_user' not in st.session_state:
-            st.session_state.current_user = None
-        if 'user_sessions' not in st.session_state:
-            st.session_state.user_sessions = {}
-        if 'current_session_id' not in st.session_state:
-            st.session_state.current_session_id = None
+        # Initialize session state for multi-user support; runs on every rerun, so one setdefault per key
+        for key, default in SESSION_STATE_DEFAULTS.items():
+            st.session_state.setdefault(key, default)
     
     def hash_password(self, password):
-        """Hash password for security (simplified for demo)"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with salted scrypt, as 'scrypt$<salt hex>$<hash hex>'"""
+        salt = secrets.token_bytes(16)
+        key = hashlib.scrypt(self._password_bytes(password), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+        return f"scrypt${salt.hex()}${key.hex()}"
+    
+    def verify_password(self, password, password_hash):
+        """Check password against a hash_password result in constant time"""
+        try:
+            scheme, salt_hex, key_hex = password_hash.split('$')
+            salt = bytes.fromhex(salt_hex)
+        except ValueError:
+            return False
+        if scheme != 'scrypt':
+            return False
+        key = hashlib.scrypt(self._password_bytes(password), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+        return hmac.compare_digest(key.hex(), key_hex)
+    
+    def _password_bytes(self, password):
+        """Password as bytes; already-encoded input is used as is"""
+        return password if isinstance(password, (bytes, bytearray)) else password.encode()
     
     def authenticate_user(self, username, email, full_name, institution=None):
         """Authenticate or create user"""
         try:
             # Check if user exists
-            user = self.db_manager.get_user_by_username(username)
+            user = _fetch_user(username)
             
             if not user:
-                # Create new user
-                user_id = self.db_manager.create_user(username, email, full_name, institution)
-                user = self.db_manager.get_user_by_username(username)
+                # Create new user, using the returned row; drop the cached miss so later lookups see it
+                user = self.db_manager.create_user(username, email, full_name, institution)
+                _fetch_user.clear()
             
-            # Update last active
-            self.db_manager.update_user_activity(user.id)
+            # Update last active, at most once per interval for repeated sign-ins from this browser session
+            now = datetime.now().timestamp()
+            last_write = st.session_state.get('last_activity_write')
+            if last_write is None or last_write[0] != user.id or now - last_write[1] >= ACTIVITY_WRITE_INTERVAL:
+                self.db_manager.update_user_activity(user.id)
+                st.session_state.last_activity_write = (user.id, now)
             
             # Set session state
             st.session_state.user_authenticated = True
@@ -61,7 +99,6 @@ class UserManager:
         st.session_state.user_authenticated = False
         st.session_state.current_user = None
         st.session_state.current_session_id = None
-        st.session_state.user_sessions = {}
     
     def get_current_user(self):
         """Get current authenticated user"""
@@ -79,6 +116,7 @@ class UserManager:
         try:
             user_id = st.session_state.current_user['id']
             session_id = self.db_manager.create_exam_session(user_id, session_name, exam_info, data_mode)
+            _fetch_user_sessions.clear()
             
             # Store in session state for quick access
             st.session_state.current_session_id = str(session_id)
@@ -91,7 +129,8 @@ class UserManager:
     def load_exam_session(self, session_id):
         """Load an existing exam session"""
         try:
-            exam_session = self.db_manager.get_exam_session(session_id)
+            # The session row and its students come back from a single query
+            exam_session, student_data = self.db_manager.get_exam_session_with_data(session_id)
             if not exam_session:
                 return False, "Exam session not found"
             
@@ -103,7 +142,6 @@ class UserManager:
             st.session_state.current_session_id = str(session_id)
             
             # Load student data
-            student_data = self.db_manager.get_student_data(session_id)
             if student_data:
                 st.session_state.multi_sheet_data = student_data
                 st.session_state.data_mode = exam_session.data_mode
@@ -144,8 +182,7 @@ class UserManager:
         
         try:
             user_id = st.session_state.current_user['id']
-            sessions = self.db_manager.get_user_exam_sessions(user_id)
-            return sessions
+            return _fetch_user_sessions(user_id)
         
         except Exception as e:
             st.error(f"Failed to load user sessions: {str(e)}")
@@ -154,19 +191,9 @@ class UserManager:
     def delete_exam_session(self, session_id):
         """Delete an exam session (soft delete)"""
         try:
-            exam_session = self.db_manager.get_exam_session(session_id)
-            if not exam_session:
-                return False, "Session not found"
-            
-            # Verify user ownership
-            if str(exam_session.user_id) != st.session_state.current_user['id']:
-                return False, "Access denied"
-            
-            # Soft delete by marking as inactive
-            session = self.db_manager.get_session()
-            exam_session.is_active = False
-            session.commit()
-            session.close()
+            if not self.db_manager.soft_delete_exam_session(session_id, st.session_state.current_user['id']):
+                return False, "Session not found or access denied"
+            _fetch_user_sessions.clear()
             
             return True, "Session deleted successfully"
         
@@ -220,37 +247,41 @@ class UserManager:
         
         try:
             sessions = self.get_user_sessions()
+            # Only the ten most recently updated sessions are turned into activity entries
+            recent = heapq.nlargest(10, (s for s in sessions if s.updated_at), key=lambda s: s.updated_at)
+            # The cached list holds active sessions only, so both counts are its length
             analytics = {
                 'total_sessions': len(sessions),
-                'active_sessions': len([s for s in sessions if s.is_active]),
-                'data_modes': {},
-                'recent_activity': []
+                'active_sessions': len(sessions),
+                'data_modes': dict(Counter(s.data_mode for s in sessions)),
+                'recent_activity': [
+                    {
+                        'session_name': s.session_name,
+                        'exam_name': s.exam_name,
+                        'updated_at': s.updated_at,
+                        'data_mode': s.data_mode
+                    }
+                    for s in recent
+                ]
             }
             
-            for session in sessions:
-                # Count data modes
-                mode = session.data_mode
-                analytics['data_modes'][mode] = analytics['data_modes'].get(mode, 0) + 1
-                
-                # Recent activity
-                if session.updated_at:
-                    analytics['recent_activity'].append({
-                        'session_name': session.session_name,
-                        'exam_name': session.exam_name,
-                        'updated_at': session.updated_at,
-                        'data_mode': session.data_mode
-                    })
-            
-            # Sort recent activity
-            analytics['recent_activity'].sort(key=lambda x: x['updated_at'], reverse=True)
-            analytics['recent_activity'] = analytics['recent_activity'][:10]  # Top 10
-            
             return analytics
         
         except Exception as e:
             st.error(f"Failed to get session analytics: {str(e)}")
             return {}
 
+@st.cache_data(ttl=USER_LOOKUP_TTL, show_spinner=False)
+def _fetch_user(username):
+    """User row for username, or None, cached briefly so repeated sign-ins skip the lookup"""
+    return get_database_manager().get_user_by_username(username)
+
+# The sidebar lists the user's sessions and their analytics on every rerun; both read this cached list
+@st.cache_data(ttl=SESSION_LIST_TTL, show_spinner=False)
+def _fetch_user_sessions(user_id):
+    """Active exam sessions of user_id, newest first, cached per user"""
+    return get_database_manager().get_user_exam_sessions(user_id)
+
 def display_user_authentication():
     """Display user authentication interface"""
     user_manager = UserManager()
@@ -3,6 +3,10 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 import pandas as pd
+import hashlib
+import streamlit as st
+
+from utils.grading import grade_counts, letter_grade
 
 class ExamVisualizer:
     """Creates visualizations for exam analysis."""
@@ -17,22 +21,29 @@ class ExamVisualizer:
             'info': '#17a2b8'
         }
     
-    def create_histogram(self, marks, pass_mark=None):
+    def create_histogram(self, marks, pass_mark=None, mean=None):
         """
         Create histogram of marks distribution.
         
         Args:
             marks: List of marks
             pass_mark: Pass threshold line
+            mean: Precomputed mean of the marks (e.g. from ExamAnalyzer.analyze)
             
         Returns:
             plotly.graph_objects.Figure
         """
+        # Plotly ships ndarrays to the browser as packed binary rather than a JSON number list
+        marks_array = np.asarray(marks, dtype=np.float64)
+        return _cached_histogram(_marks_fingerprint(marks_array), pass_mark, marks_array, mean)
+    
+    def _build_histogram(self, marks_array, pass_mark, mean=None):
+        """Histogram figure of a float marks array, uncached"""
         fig = go.Figure()
         
         # Create histogram
         fig.add_trace(go.Histogram(
-            x=marks,
+            x=marks_array,
             nbinsx=20,
             name='Score Distribution',
             marker_color=self.colors['primary'],
@@ -50,7 +61,7 @@ class ExamVisualizer:
             )
         
         # Add mean line
-        mean_mark = np.mean(marks)
+        mean_mark = marks_array.mean() if mean is None else mean
         fig.add_vline(
             x=mean_mark,
             line_dash="dot",
@@ -79,10 +90,15 @@ class ExamVisualizer:
         Returns:
             plotly.graph_objects.Figure
         """
+        marks_array = np.asarray(marks, dtype=np.float64)
+        return _cached_box_plot(_marks_fingerprint(marks_array), marks_array)
+    
+    def _build_box_plot(self, marks_array):
+        """Box plot figure of a float marks array, uncached"""
         fig = go.Figure()
         
         fig.add_trace(go.Box(
-            y=marks,
+            y=marks_array,
             name='Marks',
             boxpoints='outliers',
             marker_color=self.colors['primary'],
@@ -225,13 +241,7 @@ class ExamVisualizer:
         Returns:
             dict: Grade counts
         """
-        grades = {'A+': 0, 'A': 0, 'B+': 0, 'B': 0, 'C+': 0, 'C': 0, 'D': 0, 'F': 0}
-        
-        for mark in marks:
-            grade = self.get_letter_grade(mark, max_marks)
-            grades[grade] += 1
-        
-        return grades
+        return grade_counts(marks, max_marks)
     
     def get_letter_grade(self, mark, max_marks=100):
         """
@@ -244,32 +254,16 @@ class ExamVisualizer:
         Returns:
             str: Letter grade
         """
-        percentage = (mark / max_marks) * 100
-        
-        if percentage >= 95:
-            return 'A+'
-        elif percentage >= 85:
-            return 'A'
-        elif percentage >= 75:
-            return 'B+'
-        elif percentage >= 65:
-            return 'B'
-        elif percentage >= 55:
-            return 'C+'
-        elif percentage >= 45:
-            return 'C'
-        elif percentage >= 35:
-            return 'D'
-        else:
-            return 'F'
+        return letter_grade(mark, max_marks)
     
-    def create_comparative_analysis(self, marks, benchmarks=None):
+    def create_comparative_analysis(self, marks, benchmarks=None, mean=None):
         """
         Create comparative analysis chart.
         
         Args:
             marks: List of marks
             benchmarks: Dictionary of benchmark values
+            mean: Precomputed mean of the marks (e.g. from ExamAnalyzer.analyze)
             
         Returns:
             plotly.graph_objects.Figure
@@ -281,7 +275,7 @@ class ExamVisualizer:
                 'Previous Year': 68
             }
         
-        current_avg = np.mean(marks)
+        current_avg = np.asarray(marks, dtype=np.float64).mean() if mean is None else mean
         
         categories = ['Current Class'] + list(benchmarks.keys())
         values = [current_avg] + list(benchmarks.values())
@@ -305,3 +299,21 @@ class ExamVisualizer:
         )
         
         return fig
+
+def _marks_fingerprint(marks_array):
+    """Short digest of a float marks array, hashed in place of the marks by the cached figure builders"""
+    return hashlib.blake2b(marks_array.tobytes(), digest_size=16).hexdigest()
+
+# Streamlit reruns rebuild every chart; these reuse the figure while the marks are unchanged. cache_resource
+# hands back the stored figure itself (a cache_data copy costs as much as a rebuild), so callers treat it as
+# read-only. Arguments with a leading underscore are not hashed, the fingerprint stands in for them (the mean
+# is derived from the marks, so it needs no key of its own).
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _cached_histogram(fingerprint, pass_mark, _marks_array, _mean=None):
+    """Histogram figure, cached per marks fingerprint and pass mark"""
+    return ExamVisualizer()._build_histogram(_marks_array, pass_mark, _mean)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _cached_box_plot(fingerprint, _marks_array):
+    """Box plot figure, cached per marks fingerprint"""
+    return ExamVisualizer()._build_box_plot(_marks_array)